@@ -0,0 +1,369 @@
+"""
+Benchmarks of the bot's update handling, layer by layer - no network or AC needed
+
+Every layer runs in-process against fake_bot_api.py and switcher_emulator.py,
+and the results are stored as JSON so runs of two versions can be compared:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+    python benchmark.py --only parse,auth,menu --iterations 20000
+    python benchmark.py --only memory --memory-updates 5000 --memory-budget 64
+
+Layers:
+    startup        cold start in fresh interpreters, per phase, plus the slowest imports
+    memory         RSS of each PROFILE after startup and after --memory-updates updates, one process each
+    parse          webhook prefilter + JSON + Update.de_json of a button tap
+    auth           check_authorization()
+    menu           building and serializing the control keyboard
+    dispatch       handle_callback_query() for a tap the AC is already in - Bot API calls only
+    device         ACController.send_command() through the pool to the emulated Breeze
+    end_to_end     polling bot with fake Bot API and emulated Breeze, driven at --rate
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import tornado.httpserver
+import tornado.netutil
+from aioswitcher.device import DeviceState, ThermostatFanLevel, ThermostatMode, ThermostatSwing
+from telegram import Update
+from telegram.ext import CallbackContext
+
+import fake_bot_api
+import switcher_emulator
+import telegram_bot_cloud as bot
+
+LAYERS = ["startup", "memory", "parse", "auth", "menu", "dispatch", "device", "end_to_end"]
+
+CHAT_ID = 1
+DEVICE_ID = "abcdef"
+
+# Run in a fresh interpreter per startup sample - the phases main() and post_init() time, minus the network
+STARTUP_SCRIPT = """
+import json, sys
+import telegram_bot_cloud as bot
+with bot.startup_timer.phase("config"):
+    config = bot.load_config(env_file=None, environ=json.loads(sys.argv[1]))
+bot.build_application(config)
+with bot.startup_timer.phase("remotes"):
+    bot.remote_catalog.preload([config.device.remote_id])
+    bot.packet_cache.precompile(config.device)
+print(json.dumps({"ready": bot.startup_timer.elapsed(), **bot.startup_timer.phases}))
+"""
+
+# Run in a fresh interpreter per profile, so one profile's heap doesn't show up in the other's RSS.
+# The emulator's IR keys come from the parent - reading them means parsing the whole remote database.
+MEMORY_SCRIPT = """
+import asyncio, json, sys
+import benchmark
+ir_keys, on_off_type = json.loads(sys.argv[3])
+print(json.dumps(asyncio.run(benchmark.measure_memory(sys.argv[1], int(sys.argv[2]), (ir_keys, on_off_type)))))
+"""
+
+def benchmark_env(bot_api_port):
+    """Environment the benchmark configures the bot from"""
+    return {
+        "BOT_TOKEN": "123456:benchmark", "CHAT_ID_1": str(CHAT_ID), "BOT_API_URL": f"http://127.0.0.1:{bot_api_port}",
+        "DEVICE_IP": "127.0.0.1", "DEVICE_ID": DEVICE_ID, "DEVICE_KEY": "00", "SWITCHER_TOKEN": "benchmark",
+        "REMOTE_ID": "ELEC7022", "ENABLE_STATE_LISTENER": "0", "PREWARM_SESSIONS": "0",
+    }
+
+def benchmark_config(bot_api_port, profile="default"):
+    """Bot configuration of the benchmark - the environment and .env are left out on purpose"""
+    return bot.load_config(env_file=None, environ={**benchmark_env(bot_api_port), "PROFILE": profile})
+
+def summarize(durations, elapsed):
+    """ops/sec and p50/p99 in microseconds of per-operation durations (seconds)"""
+    return {
+        "iterations": len(durations),
+        "ops_per_sec": round(len(durations) / elapsed, 1),
+        "p50_us": round(fake_bot_api.percentile(durations, 50) * 1e6, 2),
+        "p99_us": round(fake_bot_api.percentile(durations, 99) * 1e6, 2),
+    }
+
+def measure(operation, iterations):
+    """Time operation() iterations times, after a short warm-up"""
+    for _ in range(min(100, iterations // 10)):
+        operation()
+    durations = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - op_started)
+    return summarize(durations, time.perf_counter() - started)
+
+async def measure_async(operation, iterations):
+    """Time await operation(i) for i in range(iterations), after a short warm-up"""
+    for i in range(min(10, iterations // 10)):
+        await operation(-i - 1)
+    durations = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        op_started = time.perf_counter()
+        await operation(i)
+        durations.append(time.perf_counter() - op_started)
+    return summarize(durations, time.perf_counter() - started)
+
+def callback_body(message_id, data="turn_on"):
+    """Raw webhook body of a button tap by the authorized chat"""
+    user = {"id": CHAT_ID, "is_bot": False, "first_name": "Benchmark"}
+    return json.dumps({"update_id": message_id, "callback_query": {
+        "id": f"cb{message_id}", "chat_instance": str(CHAT_ID), "data": data, "from": user,
+        "message": {"message_id": message_id, "date": int(time.time()), "text": "🏠 AC Control",
+                    "chat": {"id": CHAT_ID, "type": "private"}},
+    }}).encode()
+
+def start_body(message_id):
+    """Raw webhook body of a /start message from the authorized chat"""
+    return json.dumps({"update_id": message_id, "message": {
+        "message_id": message_id, "date": int(time.time()), "text": "/start",
+        "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Benchmark"},
+        "chat": {"id": CHAT_ID, "type": "private"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    }}).encode()
+
+def parse_update(body, telegram_bot):
+    """What the webhook handler does with a body before queueing it"""
+    if bot.extract_chat_id(body) != CHAT_ID:
+        raise RuntimeError("prefilter dropped the benchmark update")
+    return Update.de_json(json.loads(body), telegram_bot)
+
+def mark_ac_on(runtime):
+    """A fresh state snapshot saying the AC is ON, so ON taps are skipped without device I/O"""
+    runtime.state_cache.update(DEVICE_ID, DeviceState.ON, ThermostatMode.COOL, 24,
+                           ThermostatFanLevel.MEDIUM, ThermostatSwing.OFF, "benchmark")
+
+async def start_bot(profile="default", ir_keys=None):
+    """Fake Bot API, emulated Breeze and an initialized bot application using them"""
+    bot_api = fake_bot_api.FakeBotApi()
+    server = tornado.httpserver.HTTPServer(fake_bot_api.make_app(bot_api))
+    sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+    server.add_sockets(sockets)
+    config = benchmark_config(sockets[0].getsockname()[1], profile)
+    application = bot.build_application(config)
+    ir_keys, on_off_type = ir_keys or switcher_emulator.load_ir_keys(config.device.remote_id)
+    emulator = switcher_emulator.BreezeEmulator(DEVICE_ID, ir_keys=ir_keys, on_off_type=on_off_type)
+    await emulator.start(broadcast_interval=0)
+    await application.initialize()
+    await application.bot_data["runtime"].preload_remotes()
+    return bot_api, server, emulator, application
+
+async def stop_bot(bot_api, server, emulator, application):
+    """Tear down what start_bot() started"""
+    await application.bot_data["runtime"].pool.close()
+    await application.shutdown()
+    await emulator.close()
+    bot_api.release_pollers()
+    server.stop()
+
+async def run_layers(args, layers):
+    """Run the selected layers and return their results"""
+    bot_api, server, emulator, application = await start_bot()
+    runtime = application.bot_data["runtime"]
+    config = runtime.config
+    
+    results = {}
+    telegram_bot = application.bot
+    body = callback_body(1)
+    update = parse_update(body, telegram_bot)
+    try:
+        if "parse" in layers:
+            results["parse"] = measure(lambda: parse_update(body, telegram_bot), args.iterations)
+        if "auth" in layers:
+            device_name = runtime.registry.get("").name
+            results["auth"] = measure(lambda: bot.check_authorization(runtime, update, "turn_on", device_name), args.iterations)
+        if "menu" in layers:
+            results["menu"] = measure(lambda: bot.serialize_markup(bot.build_control_menu(runtime.registry)), args.iterations)
+        if "dispatch" in layers:
+            async def dispatch(i):
+                mark_ac_on(runtime)
+                # A new message per tap, so edit suppression doesn't skip the final edit
+                tap = parse_update(callback_body(1_000_000 + i), telegram_bot)
+                await bot.handle_callback_query(tap, CallbackContext.from_update(tap, application))
+            results["dispatch"] = await measure_async(dispatch, args.async_iterations)
+        if "device" in layers:
+            controller = runtime.registry.controller("")
+            async def send(i):
+                command = "ON" if i % 2 else "OFF"
+                result = await controller.send_command(command, force=True, deadline=bot.Deadline(config.update_deadline))
+                if not result.success:
+                    raise RuntimeError(f"{command} failed against the emulator: {result}")
+            results["device"] = await measure_async(send, args.async_iterations)
+            results["device"]["emulator"] = dict(emulator.stats)
+        if "end_to_end" in layers:
+            results["end_to_end"] = await run_end_to_end(args, application, bot_api)
+    finally:
+        await stop_bot(bot_api, server, emulator, application)
+    return results
+
+async def run_end_to_end(args, application, bot_api):
+    """Polling bot against the fake Bot API, driven at args.rate updates/sec"""
+    await application.start()
+    await application.updater.start_polling(poll_interval=0, timeout=1)
+    bot_api.calls.clear()
+    bot_api.answer_latencies.clear()
+    bot_api.complete_latencies.clear()
+    try:
+        return await fake_bot_api.drive(bot_api, args.rate, args.duration, [CHAT_ID], "mixed")
+    finally:
+        bot_api.release_pollers()
+        await application.updater.stop()
+        await application.stop()
+
+async def measure_memory(profile, updates, ir_keys):
+    """RSS in MB of a bot in profile after startup, and after handling updates taps and /start messages"""
+    bot_api, server, emulator, application = await start_bot(profile, ir_keys)
+    gc.collect()
+    startup_mb, _ = bot.memory_usage()
+    try:
+        for i in range(updates):
+            message_id = 1_000_000 + i
+            body = start_body(message_id) if i % 4 == 3 else callback_body(message_id, ("turn_on", "turn_off")[i % 2])
+            await application.process_update(parse_update(body, application.bot))
+    finally:
+        await stop_bot(bot_api, server, emulator, application)
+    gc.collect()
+    steady_mb, peak_mb = bot.memory_usage()
+    return {
+        "updates": updates, "startup_mb": round(startup_mb, 1), "steady_mb": round(steady_mb, 1),
+        "growth_mb": round(steady_mb - startup_mb, 1), "peak_mb": round(peak_mb, 1),
+        "bot_api_calls": sum(bot_api.calls.values()), "device_commands": emulator.stats.get("commands", 0),
+    }
+
+def run_memory(updates):
+    """measure_memory() of every PROFILE, each in a fresh interpreter"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    ir_keys = json.dumps(switcher_emulator.load_ir_keys(benchmark_env(0)["REMOTE_ID"]))
+    results = {}
+    for profile in bot.PROFILES:
+        output = subprocess.run([sys.executable, "-c", MEMORY_SCRIPT, profile, str(updates), ir_keys], cwd=cwd,
+                                capture_output=True, text=True, check=True).stdout
+        results[f"memory_{profile}"] = json.loads(output.splitlines()[-1])
+    return results
+
+def run_startup(runs):
+    """Median startup phases over runs fresh interpreters, in ms"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    env = json.dumps(benchmark_env(0))
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, env], cwd=cwd,
+                                capture_output=True, text=True, check=True).stdout
+        sample = json.loads(output)
+        sample["process"] = time.perf_counter() - started  # with interpreter startup and exit
+        samples.append(sample)
+    median_ms = lambda phase: round(statistics.median(sample[phase] for sample in samples) * 1000, 1)
+    return {
+        "runs": runs, "ready_ms": median_ms("ready"), "process_ms": median_ms("process"),
+        "phases_ms": {phase: median_ms(phase) for phase in samples[0] if phase not in ("ready", "process")},
+        "slowest_imports_ms": slowest_imports(cwd),
+    }
+
+def slowest_imports(cwd, count=8):
+    """The bot's direct imports that took longest under -X importtime (cumulative ms)"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import telegram_bot_cloud"], cwd=cwd,
+                            capture_output=True, text=True, check=True).stderr
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # One leading space, plus two per nesting level below telegram_bot_cloud
+        if len(name) - len(name.lstrip()) == 3:
+            imports[name.strip()] = round(int(cumulative) / 1000, 1)
+    return dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)[:count])
+
+def git_commit():
+    """Short hash of the checked out commit, if this is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(old, new):
+    """Print how each layer's throughput and latency changed between two result files"""
+    for layer, result in new["results"].items():
+        previous = old["results"].get(layer)
+        if not previous:
+            continue
+        for metric in ("ops_per_sec", "updates_per_sec", "p50_us", "p99_us", "complete_p50_ms", "complete_p99_ms",
+                       "ready_ms", "process_ms", "startup_mb", "steady_mb", "peak_mb"):
+            if result.get(metric) is None or not previous.get(metric):
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric] * 100
+            print(f"  {layer:<12} {metric:<16} {previous[metric]:>12} -> {result[metric]:>12} ({change:+.1f}%)")
+
+def main():
+    """Parse arguments, run the benchmarks and store the results"""
+    parser = argparse.ArgumentParser(description="Benchmark the bot's update handling offline")
+    parser.add_argument("--only", help=f"comma separated layers out of {','.join(LAYERS)}")
+    parser.add_argument("--iterations", type=int, default=5000, help="iterations of the in-memory layers")
+    parser.add_argument("--async-iterations", type=int, default=300, help="iterations of dispatch and device")
+    parser.add_argument("--rate", type=float, default=20.0, help="end to end updates per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="end to end seconds")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters started for startup")
+    parser.add_argument("--startup-budget", type=float, help="fail when startup takes longer than this (ms)")
+    parser.add_argument("--memory-updates", type=int, default=2000, help="updates handled before the steady state RSS")
+    parser.add_argument("--memory-budget", type=float, help="fail when the lite profile's steady RSS exceeds this (MB)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="log what the bot does, as it would at INFO level")
+    args = parser.parse_args()
+    
+    layers = args.only.split(",") if args.only else LAYERS
+    unknown = set(layers) - set(LAYERS)
+    if unknown:
+        parser.error(f"unknown layers: {', '.join(sorted(unknown))}")
+    if args.verbose:
+        bot.setup_logging()
+    
+    results = {}
+    if "startup" in layers:
+        results["startup"] = run_startup(args.startup_runs)
+        if args.startup_budget:
+            results["startup"]["budget_ms"] = args.startup_budget
+    if "memory" in layers:
+        results.update(run_memory(args.memory_updates))
+        if args.memory_budget:
+            results["memory_lite"]["budget_mb"] = args.memory_budget
+    if set(layers) - {"startup", "memory"}:
+        results.update(asyncio.run(run_layers(args, layers)))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": git_commit(),
+            "python": platform.python_version(), "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    with open(args.output, "w") as output_fd:
+        json.dump(report, output_fd, indent=2, ensure_ascii=False)
+    print(f"📝 Wrote {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as compare_fd:
+            print(f"📊 Compared to {args.compare}:")
+            compare(json.load(compare_fd), report)
+    
+    startup = results.get("startup")
+    if startup and args.startup_budget and startup["ready_ms"] > args.startup_budget:
+        print(f"❌ Startup took {startup['ready_ms']}ms, over the {args.startup_budget:.0f}ms budget")
+        sys.exit(1)
+    lite = results.get("memory_lite")
+    if lite and args.memory_budget and lite["steady_mb"] > args.memory_budget:
+        print(f"❌ Lite profile RSS is {lite['steady_mb']}MB after {lite['updates']} updates, "
+              f"over the {args.memory_budget:.0f}MB budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Fake Telegram Bot API - a local stand-in for api.telegram.org for offline benchmarks
+
+Serves the Bot API methods the bot uses and drives synthetic updates at it:
+    python fake_bot_api.py --port 8081 --rate 20 --duration 30 --chat-id 1
+    BOT_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123:fake CHAT_ID_1=1 python telegram_bot_cloud.py
+
+Slow or rate limited Telegram can be injected:
+    python fake_bot_api.py --rate 20 --latency 0.05 --jitter 0.1 --rate-limit 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, deque
+
+import tornado.httpclient
+import tornado.web
+
+# Methods that never get latency or 429s injected - they pace the bot rather than answer it
+PACING_METHODS = {"getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo"}
+
+class RateLimited(Exception):
+    """Injected 429 - Telegram's flood control"""
+
+def percentile(samples, percent):
+    """percent-th percentile of samples (nearest rank), None when there are none"""
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+class FakeBotApi:
+    """Bot API state: queued updates, the webhook, and latency bookkeeping for the driver"""
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=0.0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.client_ready = asyncio.Event()  # set once the bot polls or registers a webhook
+        self.calls = Counter()
+        self._updates = []
+        self._new_update = asyncio.Event()
+        self._next_update_id = 1
+        self._next_message_id = 1000
+        # Driver bookkeeping: when each synthetic update was pushed, and how long the bot took
+        self._awaiting_answer = {}
+        self._awaiting_edit = {}
+        self._awaiting_reply = {}
+        self.answer_latencies = []
+        self.complete_latencies = []
+    
+    async def call(self, method, params):
+        """Result of a Bot API method call"""
+        self.calls[method] += 1
+        if method not in PACING_METHODS:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+            if random.random() < self.rate_limit:
+                self.calls["429"] += 1
+                raise RateLimited()
+        handler = getattr(self, f"_{method}", None)
+        return await handler(params) if handler else True
+    
+    async def _getMe(self, params):
+        return {"id": 1, "is_bot": True, "first_name": "Fake AC Bot", "username": "fake_ac_bot",
+                "can_join_groups": False, "can_read_all_group_messages": False,
+                "supports_inline_queries": False}
+    
+    async def _getUpdates(self, params):
+        """Long poll: updates from offset on, waiting up to timeout seconds for some"""
+        self.client_ready.set()
+        offset = int(params.get("offset") or 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:int(params.get("limit") or 100)]
+    
+    async def _setWebhook(self, params):
+        self.webhook_url = params["url"]
+        self.webhook_secret = params.get("secret_token")
+        self.client_ready.set()
+        return True
+    
+    async def _deleteWebhook(self, params):
+        self.webhook_url = self.webhook_secret = None
+        return True
+    
+    async def _getWebhookInfo(self, params):
+        return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": len(self._updates)}
+    
+    async def _sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        pushed = self._awaiting_reply.get(chat_id)
+        if pushed:
+            self.complete_latencies.append(time.monotonic() - pushed.popleft())
+            if not pushed:
+                del self._awaiting_reply[chat_id]
+        self._next_message_id += 1
+        return self._message(chat_id, self._next_message_id, params.get("text", ""))
+    
+    async def _editMessageText(self, params):
+        chat_id, message_id = int(params["chat_id"]), int(params["message_id"])
+        # The bot's final edit brings the menu back - that's when the tap is done
+        if "reply_markup" in params:
+            pushed = self._awaiting_edit.pop((chat_id, message_id), None)
+            if pushed is not None:
+                self.complete_latencies.append(time.monotonic() - pushed)
+        return self._message(chat_id, message_id, params.get("text", ""))
+    
+    async def _answerCallbackQuery(self, params):
+        pushed = self._awaiting_answer.pop(params["callback_query_id"], None)
+        if pushed is not None:
+            self.answer_latencies.append(time.monotonic() - pushed)
+        return True
+    
+    def _message(self, chat_id, message_id, text):
+        return {"message_id": message_id, "date": int(time.time()), "text": text,
+                "chat": {"id": chat_id, "type": "private", "first_name": "Benchmark"}}
+    
+    def push_update(self, update):
+        """Deliver an update - through the webhook if one is set, else to getUpdates"""
+        update["update_id"] = self._next_update_id
+        self._next_update_id += 1
+        if self.webhook_url:
+            headers = {"Content-Type": "application/json"}
+            if self.webhook_secret:
+                headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook_secret
+            asyncio.ensure_future(tornado.httpclient.AsyncHTTPClient().fetch(
+                self.webhook_url, method="POST", body=json.dumps(update), headers=headers, raise_error=False
+            ))
+        else:
+            self._updates.append(update)
+            self._new_update.set()
+    
+    def push_callback(self, chat_id, data):
+        """Tap on an inline button of a fresh menu message"""
+        self._next_message_id += 1
+        message_id = self._next_message_id
+        callback_id = f"cb{message_id}"
+        now = time.monotonic()
+        self._awaiting_answer[callback_id] = now
+        self._awaiting_edit[(chat_id, message_id)] = now
+        self.push_update({"callback_query": {
+            "id": callback_id, "chat_instance": str(chat_id), "data": data,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Benchmark"},
+            "message": self._message(chat_id, message_id, "🏠 AC Control"),
+        }})
+    
+    def push_start(self, chat_id):
+        """/start message"""
+        self._next_message_id += 1
+        self._awaiting_reply.setdefault(chat_id, deque()).append(time.monotonic())
+        message = self._message(chat_id, self._next_message_id, "/start")
+        message["from"] = {"id": chat_id, "is_bot": False, "first_name": "Benchmark"}
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": 6}]
+        self.push_update({"message": message})
+    
+    def release_pollers(self):
+        """Answer pending long polls at once, before shutting down"""
+        self._new_update.set()
+    
+    @property
+    def in_flight(self):
+        """Synthetic updates the bot hasn't finished with yet"""
+        return len(self._awaiting_edit) + sum(len(pushed) for pushed in self._awaiting_reply.values())
+
+class BotApiHandler(tornado.web.RequestHandler):
+    """/bot<token>/<method> - form encoded (values JSON encoded) or JSON bodies, like Telegram accepts"""
+    def initialize(self, bot_api):
+        self.bot_api = bot_api
+    
+    async def post(self, token, method):
+        if self.request.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(self.request.body or b"{}")
+        else:
+            params = {}
+            for name, values in {**self.request.query_arguments, **self.request.body_arguments}.items():
+                value = values[-1].decode()
+                try:
+                    params[name] = json.loads(value)
+                except ValueError:
+                    params[name] = value
+        try:
+            result = await self.bot_api.call(method, params)
+        except RateLimited:
+            self.set_status(429)
+            retry_after = self.bot_api.retry_after
+            self.write({"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after}})
+            return
+        except KeyError as e:
+            self.set_status(400)
+            self.write({"ok": False, "error_code": 400, "description": f"Bad Request: {e} is missing"})
+            return
+        self.write({"ok": True, "result": result})
+    
+    get = post
+
+def make_app(bot_api):
+    """Tornado application serving the fake Bot API"""
+    return tornado.web.Application([(r"/bot([^/]+)/(\w+)", BotApiHandler, {"bot_api": bot_api})])
+
+async def drive(bot_api, rate, duration, chat_ids, kind="callback", callback_data=("turn_on", "turn_off"), drain=10.0):
+    """Push synthetic updates at rate per second for duration seconds, then report the bot's latencies.
+    
+    Updates go out on a fixed schedule (open loop) whether or not the bot
+    keeps up, so a slow bot shows up as latency rather than a lower rate.
+    """
+    await bot_api.client_ready.wait()
+    interval = 1 / rate
+    started = next_at = time.monotonic()
+    sent = callbacks = 0
+    while next_at - started < duration:
+        chat_id = chat_ids[sent % len(chat_ids)]
+        if kind == "start" or (kind == "mixed" and sent % 2):
+            bot_api.push_start(chat_id)
+        else:
+            # Own counter - in mixed mode sent is always even here
+            bot_api.push_callback(chat_id, callback_data[callbacks % len(callback_data)])
+            callbacks += 1
+        sent += 1
+        next_at += interval
+        await asyncio.sleep(max(0, next_at - time.monotonic()))
+    
+    drain_until = time.monotonic() + drain
+    while bot_api.in_flight and time.monotonic() < drain_until:
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - started
+    
+    completed = len(bot_api.complete_latencies)
+    to_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 2)
+    return {
+        "kind": kind, "target_rate": rate, "sent": sent, "completed": completed,
+        "unfinished": bot_api.in_flight, "updates_per_sec": round(completed / elapsed, 2),
+        "answer_p50_ms": to_ms(percentile(bot_api.answer_latencies, 50)),
+        "answer_p99_ms": to_ms(percentile(bot_api.answer_latencies, 99)),
+        "complete_p50_ms": to_ms(percentile(bot_api.complete_latencies, 50)),
+        "complete_p99_ms": to_ms(percentile(bot_api.complete_latencies, 99)),
+        "calls": dict(bot_api.calls),
+    }
+
+async def serve(args):
+    """Run the fake Bot API, and the driver when a rate is given"""
+    bot_api = FakeBotApi(args.latency, args.jitter, args.rate_limit, args.retry_after)
+    server = make_app(bot_api).listen(args.port, address=args.host)
+    print(f"✅ Fake Bot API on http://{args.host}:{args.port}")
+    try:
+        if not args.rate:
+            await asyncio.Event().wait()
+        print("⏳ Waiting for the bot to poll or set a webhook...")
+        report = await drive(bot_api, args.rate, args.duration, args.chat_id or [1], args.kind)
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if args.json:
+            with open(args.json, "w") as report_fd:
+                json.dump(report, report_fd, indent=2, ensure_ascii=False)
+            print(f"📝 Wrote {args.json}")
+    finally:
+        bot_api.release_pollers()
+        await asyncio.sleep(0.1)
+        server.stop()
+
+def main():
+    """Parse arguments and run the fake Bot API"""
+    parser = argparse.ArgumentParser(description="Serve a fake Telegram Bot API and drive updates at the bot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds of latency, up to this")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of answering 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after of injected 429s")
+    parser.add_argument("--rate", type=float, default=0.0, help="synthetic updates per second (0 just serves)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--chat-id", type=int, action="append", help="chat the updates come from (repeatable)")
+    parser.add_argument("--kind", choices=["callback", "start", "mixed"], default="callback")
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
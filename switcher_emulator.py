@@ -0,0 +1,296 @@
+"""
+Switcher Breeze emulator - a fake AC on localhost for running the bot without hardware
+
+Answers the Switcher TCP protocol (login, get state, control) on port 10000 the
+way aioswitcher expects, and broadcasts its state over UDP like a real Breeze:
+    python switcher_emulator.py --device-id abcdef
+    DEVICE_IP=127.0.0.1 DEVICE_ID=abcdef DEVICE_KEY=00 python telegram_bot_cloud.py
+
+Flaky Wi-Fi and dead devices can be injected:
+    python switcher_emulator.py --device-id abcdef --latency 0.2 --jitter 0.3 --loss 0.05 --fail 0.02
+    python switcher_emulator.py --device-id abcdef --count 4 --devices-file devices.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import struct
+
+from switcher_udp_replay import BREEZE_PORT, FAN_LEVELS, MODES, build_breeze_datagram
+
+# aioswitcher connects to Breeze (protocol type 2) devices on this port
+TCP_PORT = 10000
+
+# Packet type - bytes 4-8 of every request
+LOGIN_PACKET = bytes.fromhex("0305a600")
+GET_STATE_PACKET = bytes.fromhex("03050103")
+CONTROL_PACKET = bytes.fromhex("03050102")
+
+# Control packets carry "Para|HexCode" of the IR command from this offset, before the 4 byte signature
+COMMAND_OFFSET = 83
+
+# IR keys in aioswitcher's remote database: [on_]<mode><temp>[_f<fan>][_d1], off, FUN_d0/FUN_d1
+IR_KEY_PATTERN = re.compile(r"(on_)?(aa|ad|aw|ar|ah)(\d*)(?:_(f\d))?(_d1)?$")
+IR_MODES = {"aa": "auto", "ad": "dry", "aw": "fan", "ar": "cool", "ah": "heat"}
+IR_FAN_LEVELS = {f"f{level}": name for name, level in FAN_LEVELS.items()}
+
+def load_ir_keys(remote_id):
+    """Map the remote's IR codes back to their keys - empty without aioswitcher's remote database"""
+    try:
+        from aioswitcher.api.remotes import BREEZE_REMOTE_DB_FPATH
+        with open(BREEZE_REMOTE_DB_FPATH) as remotes_fd:
+            remote = json.load(remotes_fd)[remote_id]
+    except (ImportError, OSError, KeyError):
+        print(f"⚠️ No IR codes for {remote_id} - commands are acknowledged but don't change the state")
+        return {}, False
+    return {wave["HexCode"]: wave["Key"] for wave in remote["IRWaveList"]}, remote["OnOffType"]
+
+class BreezeEmulator:
+    """One fake Breeze: its AC state, a TCP control server and a UDP status broadcaster"""
+    def __init__(self, device_id, ip="127.0.0.1", device_key="00", remote_id="ELEC7022",
+                 name="Breeze Emulator", latency=0.0, jitter=0.0, loss=0.0, fail=0.0,
+                 ir_keys=None, on_off_type=False):
+        self.device_id = device_id
+        self.ip = ip
+        self.device_key = device_key
+        self.remote_id = remote_id
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.fail = fail
+        self.ir_keys = ir_keys or {}
+        self.on_off_type = on_off_type
+        # Special swing remotes leave swing out of the state keys and send FUN_d0/FUN_d1 instead
+        self.separate_swing = any(key.startswith("FUN_d") for key in self.ir_keys.values())
+        # ...and when FUN_d0 and FUN_d1 share one IR code, it's a swing toggle button
+        self.swing_toggle = self.separate_swing and not {"FUN_d0", "FUN_d1"} <= set(self.ir_keys.values())
+        self.online = True  # see set_online()
+        self.state = {"power": "off", "mode": "cool", "target_temp": 24, "fan": "medium",
+                      "swing": "off", "room_temp": 26.5}
+        self.stats = {"connections": 0, "logins": 0, "state_queries": 0, "commands": 0,
+                      "lost": 0, "failed": 0}
+        self._server = None
+        self._port = None
+        self._broadcast_task = None
+        self._connections = set()
+    
+    async def start(self, port=TCP_PORT, broadcast_host="127.0.0.1", broadcast_interval=4.0):
+        """Listen for control connections and start broadcasting"""
+        self._port = port
+        self._server = await asyncio.start_server(self._handle_connection, self.ip, port)
+        if broadcast_interval > 0:
+            self._broadcast_task = asyncio.create_task(self._broadcast(broadcast_host, broadcast_interval))
+    
+    async def close(self):
+        """Stop the server, the broadcasts and every open connection"""
+        if self._broadcast_task:
+            self._broadcast_task.cancel()
+        if self._server:
+            self._server.close()
+        for writer in list(self._connections):
+            self._reset(writer)
+        if self._server:
+            await self._server.wait_closed()
+    
+    async def set_online(self, online):
+        """Take the device off the network (refusing connections, resetting open ones) or bring it back"""
+        self.online = online
+        if online and not self._server.is_serving():
+            self._server = await asyncio.start_server(self._handle_connection, self.ip, self._port)
+        elif not online:
+            self._server.close()
+            for writer in list(self._connections):
+                self._reset(writer)
+    
+    def _reset(self, writer):
+        """Drop a connection with a TCP reset, the way a device falling off Wi-Fi looks to the client"""
+        self._connections.discard(writer)
+        if writer.transport.is_closing():
+            return  # already reset - its socket is closed
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        writer.transport.abort()
+    
+    def datagram(self):
+        """Current state as a Breeze status broadcast"""
+        state = self.state
+        return build_breeze_datagram(
+            self.device_id, ip=self.ip, power=state["power"], mode=state["mode"],
+            target_temp=state["target_temp"], fan=state["fan"], swing=state["swing"],
+            room_temp=state["room_temp"], device_key=self.device_key,
+            remote_id=self.remote_id, name=self.name
+        )
+    
+    async def _broadcast(self, host, interval):
+        """Send the state datagram every interval seconds, like a real Breeze"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            while True:
+                if self.online:
+                    sock.sendto(self.datagram(), (host, BREEZE_PORT))
+                await asyncio.sleep(interval)
+        finally:
+            sock.close()
+    
+    async def _handle_connection(self, reader, writer):
+        """Answer request packets until the client disconnects"""
+        self.stats["connections"] += 1
+        self._connections.add(writer)
+        try:
+            while True:
+                packet = await reader.read(1024)
+                if not packet:
+                    break
+                response = self._respond(packet)
+                await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+                if random.random() < self.fail:
+                    self.stats["failed"] += 1
+                    self._reset(writer)
+                    break
+                if random.random() < self.loss:
+                    self.stats["lost"] += 1
+                    continue  # the client waits for an answer that never comes
+                writer.write(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.transport.abort()
+    
+    def _respond(self, packet):
+        """Response bytes for one request packet"""
+        packet_type = packet[4:8]
+        if packet_type == LOGIN_PACKET:
+            self.stats["logins"] += 1
+            return self._login_response()
+        if packet_type == GET_STATE_PACKET:
+            self.stats["state_queries"] += 1
+            return self._state_response()
+        if packet_type == CONTROL_PACKET:
+            self.stats["commands"] += 1
+            self._apply_command(packet[COMMAND_OFFSET:-4])
+        return b"\xfe\xf0" + bytes(38)  # a plain acknowledgement
+    
+    def _login_response(self):
+        """Login reply - aioswitcher reads the session ID from bytes 8-12"""
+        response = bytearray(40)
+        response[0:2] = b"\xfe\xf0"
+        response[8:12] = os.urandom(4)
+        return bytes(response)
+    
+    def _state_response(self):
+        """Breeze state reply in the layout aioswitcher's StateMessageParser reads"""
+        state = self.state
+        response = bytearray(100)
+        response[0:2] = b"\xfe\xf0"
+        response[76:78] = int(state["room_temp"] * 10).to_bytes(2, "little")
+        response[78] = 0x01 if state["power"] == "on" else 0x00
+        response[79] = MODES[state["mode"]]
+        response[80] = state["target_temp"]
+        response[81] = int(FAN_LEVELS[state["fan"]] + ("1" if state["swing"] == "on" else "0"), 16)
+        response[84:92] = self.remote_id.encode()[:8].ljust(8, b"\x00")
+        return bytes(response)
+    
+    def _apply_command(self, command):
+        """Update the AC state from the IR code a control packet carries"""
+        try:
+            para_hexcode = command[4:].decode()
+        except UnicodeDecodeError:
+            return
+        key = self.ir_keys.get(para_hexcode.rpartition("|")[2])
+        if key is None:
+            return
+        state = self.state
+        if key == "off":
+            state["power"] = "off"
+        elif key.startswith("FUN_d") and self.swing_toggle:
+            state["swing"] = "on" if state["swing"] == "off" else "off"
+        elif key.startswith("FUN_d"):
+            state["swing"] = "on" if key == "FUN_d1" else "off"
+        elif match := IR_KEY_PATTERN.match(key):
+            toggle, mode, target_temp, fan, swing = match.groups()
+            if not self.on_off_type:
+                state["power"] = "on"
+            elif toggle:
+                state["power"] = "off" if state["power"] == "on" else "on"
+            state["mode"] = IR_MODES[mode]
+            if target_temp:
+                state["target_temp"] = int(target_temp)
+            if fan:
+                state["fan"] = IR_FAN_LEVELS[fan]
+            if not self.separate_swing:
+                state["swing"] = "on" if swing else "off"
+        print(f"🌬️ {self.name}: {key} -> {state['power']} {state['mode']} {state['target_temp']}°")
+
+def emulated_devices(args):
+    """BreezeEmulator per --count, on consecutive loopback addresses with consecutive device IDs"""
+    ir_keys, on_off_type = load_ir_keys(args.remote_id)
+    first_id = int(args.device_id, 16)
+    return [
+        BreezeEmulator(
+            f"{first_id + index:06x}", ip=f"127.0.0.{index + 1}", device_key=args.device_key,
+            remote_id=args.remote_id, name=f"Breeze Emulator {index + 1}",
+            latency=args.latency, jitter=args.jitter, loss=args.loss, fail=args.fail,
+            ir_keys=ir_keys, on_off_type=on_off_type
+        )
+        for index in range(args.count)
+    ]
+
+def write_devices_file(path, devices):
+    """DEVICES_FILE for the bot pointing at the emulated devices"""
+    config = {"devices": [
+        {"name": f"ac{index + 1}", "ip": device.ip, "device_id": device.device_id,
+         "device_key": device.device_key, "remote_id": device.remote_id}
+        for index, device in enumerate(devices)
+    ]}
+    with open(path, "w") as devices_fd:
+        json.dump(config, devices_fd, indent=2)
+    print(f"📝 Wrote {path}")
+
+async def serve(args):
+    """Run the emulated devices until interrupted"""
+    devices = emulated_devices(args)
+    for device in devices:
+        await device.start(args.port, args.broadcast_host, args.broadcast_interval)
+        print(f"✅ {device.name} listening on {device.ip}:{args.port} (device ID {device.device_id})")
+    if args.devices_file:
+        write_devices_file(args.devices_file, devices)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for device in devices:
+            await device.close()
+            print(f"📊 {device.name}: {device.stats}")
+
+def main():
+    """Parse arguments and run the emulator"""
+    parser = argparse.ArgumentParser(description="Emulate Switcher Breeze devices locally")
+    parser.add_argument("--device-id", default="abcdef", help="6 hex digit device ID")
+    parser.add_argument("--device-key", default="00")
+    parser.add_argument("--remote-id", default="ELEC7022")
+    parser.add_argument("--count", type=int, default=1, help="devices to emulate, on 127.0.0.1, 127.0.0.2, ...")
+    parser.add_argument("--port", type=int, default=TCP_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds of latency, up to this")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of not answering a request")
+    parser.add_argument("--fail", type=float, default=0.0, help="probability of resetting the connection")
+    parser.add_argument("--broadcast-host", default="127.0.0.1")
+    parser.add_argument("--broadcast-interval", type=float, default=4.0, help="0 disables the broadcasts")
+    parser.add_argument("--devices-file", help="write a DEVICES_FILE for the bot here")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Switcher UDP broadcast replay - local stand-in for a Breeze on the LAN
+
+Feeds the bot's state listener without a physical device:
+    python switcher_udp_replay.py record capture.txt
+    python switcher_udp_replay.py replay capture.txt --drop 0.3 --loop
+    python switcher_udp_replay.py synth --device-id 0a1b2c --power on --temp 24
+"""
+
+import argparse
+import random
+import socket
+import time
+
+# Ports the Switcher devices broadcast on (aioswitcher listens on all of them)
+BROADCAST_PORTS = [20002, 10002, 20003, 10003]
+BREEZE_PORT = 10003
+
+MODES = {"auto": 0x01, "dry": 0x02, "fan": 0x03, "cool": 0x04, "heat": 0x05}
+FAN_LEVELS = {"auto": "0", "low": "1", "medium": "2", "high": "3"}
+
+def build_breeze_datagram(device_id, ip="127.0.0.1", power="on", mode="cool", target_temp=24,
+                          fan="medium", swing="off", room_temp=25.0, device_key="00",
+                          remote_id="ELEC7022", name="Breeze Emulator"):
+    """Build a 168 byte Breeze status broadcast in the layout aioswitcher parses"""
+    message = bytearray(168)
+    message[0:2] = b"\xfe\xf0"
+    message[18:21] = bytes.fromhex(device_id)
+    message[40:41] = bytes.fromhex(device_key)
+    message[42:74] = name.encode()[:32].ljust(32, b"\x00")
+    message[74:76] = bytes.fromhex("0e01")  # DeviceType.BREEZE
+    message[77:81] = socket.inet_aton(ip)
+    message[81:87] = bytes.fromhex("0200" + device_id + "01")  # locally administered MAC
+    message[135:137] = int(room_temp * 10).to_bytes(2, "little")
+    message[137] = 0x01 if power == "on" else 0x00
+    message[138] = MODES[mode]
+    message[139] = target_temp
+    message[140] = int(FAN_LEVELS[fan] + ("1" if swing == "on" else "0"), 16)
+    message[143:151] = remote_id.encode()[:8].ljust(8, b"\x00")
+    return bytes(message)
+
+def read_capture(path):
+    """Read hex datagrams, one per line (blank lines and # comments ignored)"""
+    with open(path) as capture:
+        return [bytes.fromhex(line.strip()) for line in capture
+                if line.strip() and not line.startswith("#")]
+
+def record(path, duration):
+    """Capture real Switcher broadcasts from the LAN into a replay file"""
+    sockets = []
+    for port in BROADCAST_PORTS:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("0.0.0.0", port))
+        sock.setblocking(False)
+        sockets.append(sock)
+
+    deadline = time.monotonic() + duration
+    count = 0
+    with open(path, "w") as capture:
+        capture.write(f"# Switcher broadcasts recorded {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        while time.monotonic() < deadline:
+            for sock in sockets:
+                try:
+                    data, addr = sock.recvfrom(1024)
+                except BlockingIOError:
+                    continue
+                capture.write(data.hex() + "\n")
+                count += 1
+                print(f"📥 {len(data)} bytes from {addr[0]}")
+            time.sleep(0.05)
+    print(f"✅ Recorded {count} datagrams to {path}")
+
+def replay(datagrams, host, port, interval, drop, loop):
+    """Send datagrams to the listener, randomly dropping some to simulate missed packets"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = dropped = 0
+    try:
+        while True:
+            for data in datagrams:
+                if random.random() < drop:
+                    dropped += 1
+                else:
+                    sock.sendto(data, (host, port))
+                    sent += 1
+                time.sleep(interval)
+            if not loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    print(f"✅ Sent {sent} datagrams, dropped {dropped}")
+
+def main():
+    """Parse arguments and record, replay or synthesize broadcasts"""
+    parser = argparse.ArgumentParser(description="Replay Switcher UDP broadcasts locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=BREEZE_PORT)
+    parser.add_argument("--interval", type=float, default=4.0, help="seconds between datagrams")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability of dropping a datagram")
+    parser.add_argument("--loop", action="store_true", help="repeat until interrupted")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="capture broadcasts from the LAN")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--duration", type=float, default=60.0)
+
+    replay_parser = commands.add_parser("replay", help="send a recorded capture")
+    replay_parser.add_argument("path")
+
+    synth_parser = commands.add_parser("synth", help="send a synthetic Breeze broadcast")
+    synth_parser.add_argument("--device-id", required=True, help="6 hex digit device ID")
+    synth_parser.add_argument("--power", choices=["on", "off"], default="on")
+    synth_parser.add_argument("--mode", choices=list(MODES), default="cool")
+    synth_parser.add_argument("--temp", type=int, default=24)
+    synth_parser.add_argument("--fan", choices=list(FAN_LEVELS), default="medium")
+    synth_parser.add_argument("--swing", choices=["on", "off"], default="off")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.path, args.duration)
+        return
+
+    if args.command == "replay":
+        datagrams = read_capture(args.path)
+    else:
+        datagrams = [build_breeze_datagram(
+            args.device_id, power=args.power, mode=args.mode, target_temp=args.temp,
+            fan=args.fan, swing=args.swing
+        )]
+    replay(datagrams, args.host, args.port, args.interval, args.drop, args.loop)
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,41 @@
 """
 Simplified Telegram AC Controller Bot - Toggle Only
-Load environment variables FIRST before anything else
-"""
-
-# CRITICAL: Load environment variables BEFORE any other imports
-import os
-from pathlib import Path
-from dotenv import load_dotenv
+Configuration is read by load_config() in main() - importing the module has no side effects
 
-# Load .env file immediately - before any other operations
-script_dir = Path(__file__).parent
-env_path = script_dir / '.env'
-load_dotenv(env_path, override=True)
+Heavy dependencies are imported where they are first needed, so importing the
+module stays cheap and a bad configuration fails before they are loaded:
+    telegram.ext       build_application()
+    aioswitcher.api    first device connection and remote preload (pulls in aiohttp)
+    tornado.web        webhook mode only
+"""
 
-# Verify critical variables are loaded
-bot_token = os.getenv("BOT_TOKEN")
-if not bot_token:
-    print("❌ ERROR: BOT_TOKEN not found in environment variables!")
-    print("Please check your .env file exists and contains BOT_TOKEN=your_token_here")
-    exit(1)
+import time
+# Taken before anything else is imported, so the startup report covers this module's imports
+IMPORT_STARTED = time.perf_counter()
 
-# Now import everything else
 import asyncio
+import hmac
+import json
 import logging
-import platform
-import socket
-import psutil
+import os
+import random
+import re
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+from binascii import crc_hqx
+from collections import OrderedDict, deque
+from contextlib import aclosing, contextmanager
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from aioswitcher.api import SwitcherApi
-from aioswitcher.api.remotes import SwitcherBreezeRemoteManager
-from aioswitcher.device import DeviceType, DeviceState, ThermostatFanLevel, ThermostatMode, ThermostatSwing
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional
+from aioswitcher.device import DeviceType, DeviceState, SwitcherThermostat, ThermostatFanLevel, ThermostatMode, ThermostatSwing
+
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
 
 # Configure logging properly to prevent token exposure
 def setup_logging():
@@ -52,128 +56,1549 @@ def setup_logging():
     logging.getLogger("telegram").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("aioswitcher").setLevel(logging.WARNING)
+
+# Configured by setup_logging() in main() - embedding programs keep their own logging setup
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+    """Time spent in each startup phase, for the boot report and the startup budget"""
+    def __init__(self, started):
+        self.started = started
+        self.phases = {}
+    
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
     
-    return logging.getLogger(__name__)
+    @contextmanager
+    def phase(self, name):
+        """Time a block as a startup phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+    
+    def elapsed(self):
+        """Seconds since this module started importing"""
+        return time.perf_counter() - self.started
+    
+    def report(self):
+        """Phases slowest first, like "import telegram.ext 310ms, remotes 140ms, ..." """
+        phases = sorted(self.phases.items(), key=lambda phase: phase[1], reverse=True)
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in phases)
+
+startup_timer = StartupTimer(IMPORT_STARTED)
 
-# Setup logging and get main logger
-logger = setup_logging()
+def memory_usage():
+    """(current, peak) resident set size of the process in MB - (None, None) without /proc"""
+    try:
+        with open("/proc/self/status") as status_fd:
+            fields = dict(line.split(":", 1) for line in status_fd if ":" in line)
+    except OSError:
+        return None, None
+    to_mb = lambda name: int(fields[name].split()[0]) / 1024 if name in fields else None
+    return to_mb("VmRSS"), to_mb("VmHWM")
 
-# Bot Configuration - using environment variables for security
-BOT_TOKEN = bot_token  # Use the verified token from above
+def describe_memory():
+    """Current and peak RSS, like "RSS 52.1MB (peak 61.0MB)" """
+    rss, peak = memory_usage()
+    if rss is None:
+        return "RSS unknown"
+    return f"RSS {rss:.1f}MB (peak {peak:.1f}MB)"
 
-# Handle missing environment variables gracefully
-try:
-    AUTHORIZED_CHAT_IDS = [
-        int(os.getenv("CHAT_ID_1")),
-        int(os.getenv("CHAT_ID_2"))
-    ]
-except (TypeError, ValueError) as e:
-    logger.error(f"Error reading CHAT_ID environment variables: {e}")
-    logger.error("Please ensure CHAT_ID_1 and CHAT_ID_2 are set in your .env file or environment variables")
-    exit(1)
-
-# Switcher Breeze Configuration - using environment variables
-DEVICE_IP = os.getenv("DEVICE_IP")
-DEVICE_ID = os.getenv("DEVICE_ID")
-DEVICE_KEY = os.getenv("DEVICE_KEY")
-TOKEN = os.getenv("SWITCHER_TOKEN")
-REMOTE_ID = os.getenv("REMOTE_ID")
-
-# Verify all required variables are loaded
-required_vars = {
-    'DEVICE_IP': DEVICE_IP,
-    'DEVICE_ID': DEVICE_ID,
-    'DEVICE_KEY': DEVICE_KEY,
-    'SWITCHER_TOKEN': TOKEN,
-    'REMOTE_ID': REMOTE_ID
+# .env next to the bot - its values override the environment
+ENV_FILE = Path(__file__).parent / '.env'
+
+class ConfigError(ValueError):
+    """Missing or invalid configuration"""
+
+class DeviceConfig(NamedTuple):
+    """Connection details of one Breeze"""
+    name: str
+    ip: str
+    device_id: str
+    device_key: str
+    remote_id: str
+    
+    @property
+    def pool_key(self):
+        """Key of the device's session in the connection pool"""
+        return (self.ip, self.device_id, self.device_key)
+
+class BotConfig(NamedTuple):
+    """Validated, immutable bot configuration - built once by load_config().
+    
+    Every plain field is read from the environment variable of the same name
+    in upper case (HEDGE_DELAY for hedge_delay), falling back to the default.
+    """
+    bot_token: str
+    
+    # Runtime profile - default, or lite for low-memory hosts like a Raspberry Pi Zero.
+    # A profile only changes defaults (see PROFILES) - variables that are set still win.
+    profile: str = "default"
+    
+    # Bot API server - point at a self-hosted server or fake_bot_api.py instead of Telegram's
+    bot_api_url: str = "https://api.telegram.org"
+    # Most HTTP connections kept open to the Bot API (PTB's default pool is 256)
+    bot_api_connections: int = 256
+    
+    # Authorized users - CHAT_ID_1/CHAT_ID_2, a comma separated AUTHORIZED_CHAT_IDS list
+    # and/or an ACL_FILE (JSON). Reloaded on SIGHUP and whenever ACL_FILE changes.
+    chat_ids: frozenset = frozenset()
+    acl_file: Optional[str] = None
+    # Seconds between checks of ACL_FILE and DEVICES_FILE for changes
+    config_poll_interval: float = 10.0
+    
+    # Switcher Breeze Configuration - a DEVICES_FILE (JSON) with one entry per AC,
+    # or a single AC from the DEVICE_NAME/DEVICE_IP/DEVICE_ID/DEVICE_KEY/REMOTE_ID
+    # and SWITCHER_TOKEN environment variables
+    devices_file: Optional[str] = None
+    device: Optional[DeviceConfig] = None
+    
+    # Connection pool tuning (seconds)
+    pool_idle_timeout: float = 300.0
+    pool_keepalive_interval: float = 60.0
+    
+    # Connect and log in to every AC at startup, and again when an idle session is closed
+    prewarm_sessions: bool = True
+    
+    # Device I/O resilience - retries of transient socket errors, and the per-device circuit
+    # breaker that fails fast after BREAKER_FAILURE_THRESHOLD failures in a row (seconds)
+    connect_timeout: float = 3.0
+    device_retries: int = 2
+    retry_base_delay: float = 0.25
+    retry_max_delay: float = 2.0
+    breaker_failure_threshold: int = 3
+    breaker_reset_timeout: float = 30.0
+    
+    # Hedged requests (opt-in) - when a command takes longer than the HEDGE_PERCENTILE latency
+    # of the last HEDGE_WINDOW commands, a second attempt races it on a fresh connection.
+    # HEDGE_DELAY (seconds) is used until HEDGE_MIN_SAMPLES latencies are known.
+    hedge_requests: bool = False
+    hedge_percentile: float = 95.0
+    hedge_window: int = 100
+    hedge_min_samples: int = 20
+    hedge_delay: float = 1.5
+    
+    # Device state cache - Breeze units broadcast their state every few seconds on the LAN
+    enable_state_listener: bool = True
+    state_stale_after: float = 30.0
+    
+    # Skip ON/OFF commands when the fresh cached state already matches them
+    skip_redundant_commands: bool = True
+    
+    # Optimistic mode - answer the tap at once and report the device outcome in a later edit
+    optimistic_responses: bool = False
+    confirm_deadline: float = 15.0
+    
+    # Time budget of a button tap, from the update arriving to the device answering (seconds)
+    update_deadline: float = 10.0
+    
+    # How the interim "Sending command..." status is shown:
+    #   answer - as the callback answer toast, concurrently with the device command (2 Bot API calls)
+    #   edit   - as an extra message edit before the device command (3 Bot API calls)
+    callback_response: str = "answer"
+    
+    # Number of messages whose last rendered text/keyboard is remembered to skip no-op edits
+    edit_cache_size: int = 256
+    
+    # "All OFF" and scenes - how many ACs are commanded at once, and how long each may take
+    fanout_concurrency: int = 4
+    fanout_device_timeout: float = 20.0
+    
+    # Webhook secret token - Telegram echoes it in every webhook request header.
+    # A random one is used per run when not set, since the webhook is registered at startup.
+    webhook_secret: str = ""
+    
+    # Webhook mode when PORT is set, at RENDER_EXTERNAL_URL (or RENDER_SERVICE_URL)
+    port: int = 0
+    public_url: Optional[str] = None
+    
+    # Seconds from starting to import the bot until it is ready - a warning is logged past it
+    startup_budget: float = 5.0
+    
+    # Parse aioswitcher's ~13MB remote database in a child process, so its parse peak
+    # (~40MB) and the heap fragmentation it leaves behind stay out of the bot
+    isolate_remote_db: bool = False
+    
+    # Seconds between RSS reports at steady state (0 disables), and the RSS in MB a report
+    # warns past (0 disables)
+    memory_report_interval: float = 3600.0
+    memory_budget: float = 0.0
+    
+    # The .env the configuration was loaded from - re-read when the ACL is reloaded
+    env_file: Optional[str] = None
+
+# Defaults each PROFILE changes
+PROFILES = {
+    "default": {},
+    "lite": {
+        "bot_api_connections": 4,
+        "edit_cache_size": 32,
+        "hedge_window": 20,
+        "isolate_remote_db": True,
+        "memory_report_interval": 900.0,
+        "memory_budget": 64.0,
+    },
+}
+
+# Fields read straight from their upper-cased environment variable
+PLAIN_CONFIG_FIELDS = [
+    name for name, kind in BotConfig.__annotations__.items()
+    if kind in (bool, int, float) or name in ("bot_api_url", "acl_file", "devices_file", "callback_response")
+]
+
+# Accepted (minimum, maximum) of numeric fields - 0 would make intervals busy-loop
+# and a semaphore or window of 0 would block or break commands
+CONFIG_RANGES = {
+    "bot_api_connections": (1, None),
+    "config_poll_interval": (0.1, None),
+    "pool_idle_timeout": (1.0, None),
+    "pool_keepalive_interval": (1.0, None),
+    "connect_timeout": (0.1, None),
+    "device_retries": (0, None),
+    "retry_base_delay": (0.0, None),
+    "retry_max_delay": (0.0, None),
+    "breaker_failure_threshold": (1, None),
+    "breaker_reset_timeout": (0.0, None),
+    "hedge_percentile": (0.0, 100.0),
+    "hedge_window": (1, None),
+    "hedge_min_samples": (1, None),
+    "hedge_delay": (0.0, None),
+    "state_stale_after": (0.0, None),
+    "confirm_deadline": (0.1, None),
+    "update_deadline": (0.1, None),
+    "edit_cache_size": (0, None),
+    "fanout_concurrency": (1, None),
+    "fanout_device_timeout": (0.1, None),
+    "port": (0, 65535),
+    "startup_budget": (0.0, None),
+    "memory_report_interval": (0.0, None),
+    "memory_budget": (0.0, None),
 }
 
-missing_vars = [key for key, value in required_vars.items() if not value]
-if missing_vars:
-    logger.error(f"Missing required environment variables: {missing_vars}")
-    logger.error("Please check your .env file contains all required variables")
-    exit(1)
+# Accepted spellings of flags
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+def config_value(env, name, kind, default, errors):
+    """Parse one environment variable as kind - flags take 1/true/yes/on or 0/false/no/off"""
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    if kind is bool:
+        if value.strip().lower() in TRUE_VALUES:
+            return True
+        if value.strip().lower() in FALSE_VALUES:
+            return False
+        errors.append(f"{name} must be one of {'/'.join(sorted(TRUE_VALUES | FALSE_VALUES))}, not {value!r}")
+        return default
+    if kind not in (int, float):
+        return value  # str and Optional[str]
+    try:
+        number = kind(value)
+    except ValueError:
+        errors.append(f"{name} must be {kind.__name__}, not {value!r}")
+        return default
+    minimum, maximum = CONFIG_RANGES.get(name.lower(), (None, None))
+    if minimum is not None and number < minimum:
+        errors.append(f"{name} must be at least {minimum}, not {value!r}")
+    elif maximum is not None and number > maximum:
+        errors.append(f"{name} must be at most {maximum}, not {value!r}")
+    return number
+
+def load_config(env_file=ENV_FILE, environ=None):
+    """Build the BotConfig from environ (os.environ by default) and env_file.
+    
+    Values in env_file override the environment. Every missing or malformed
+    variable is reported in one ConfigError.
+    """
+    env = dict(os.environ if environ is None else environ)
+    if env_file and os.path.exists(env_file):
+        from dotenv import dotenv_values
+        env.update({name: value for name, value in dotenv_values(env_file).items() if value is not None})
+    
+    errors = []
+    profile = env.get("PROFILE") or "default"
+    if profile not in PROFILES:
+        errors.append(f"PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+    defaults = {**BotConfig._field_defaults, **PROFILES.get(profile, {})}
+    values = {
+        name: config_value(env, name.upper(), BotConfig.__annotations__[name], defaults[name], errors)
+        for name in PLAIN_CONFIG_FIELDS
+    }
+    values["bot_api_url"] = values["bot_api_url"].rstrip("/")
+    
+    bot_token = env.get("BOT_TOKEN")
+    if not bot_token:
+        errors.append("BOT_TOKEN is not set")
+    
+    chat_ids = set()
+    for name in ("CHAT_ID_1", "CHAT_ID_2"):
+        if env.get(name):
+            chat_ids.add(config_value(env, name, int, None, errors))
+    for chat_id in env.get("AUTHORIZED_CHAT_IDS", "").split(","):
+        if chat_id.strip():
+            try:
+                chat_ids.add(int(chat_id))
+            except ValueError:
+                errors.append(f"AUTHORIZED_CHAT_IDS has a bad chat ID: {chat_id!r}")
+    chat_ids.discard(None)
+    if not chat_ids and not values["acl_file"]:
+        errors.append("no authorized chat IDs - set CHAT_ID_1 and CHAT_ID_2, AUTHORIZED_CHAT_IDS or ACL_FILE")
+    
+    device = None
+    if not values["devices_file"]:
+        required = ("DEVICE_IP", "DEVICE_ID", "DEVICE_KEY", "SWITCHER_TOKEN", "REMOTE_ID")
+        missing = [name for name in required if not env.get(name)]
+        if missing:
+            errors.append(f"missing {', '.join(missing)} - set them or DEVICES_FILE")
+        else:
+            device = DeviceConfig(env.get("DEVICE_NAME") or "AC", env["DEVICE_IP"], env["DEVICE_ID"],
+                                  env["DEVICE_KEY"], env["REMOTE_ID"])
+    
+    if values["callback_response"] not in ("answer", "edit"):
+        errors.append(f"CALLBACK_RESPONSE must be answer or edit, not {values['callback_response']!r}")
+    if errors:
+        raise ConfigError("; ".join(errors))
+    
+    return BotConfig(
+        bot_token=bot_token, profile=profile, chat_ids=frozenset(chat_ids), device=device,
+        webhook_secret=env.get("WEBHOOK_SECRET") or secrets.token_urlsafe(32),
+        public_url=env.get("RENDER_EXTERNAL_URL") or env.get("RENDER_SERVICE_URL"),
+        env_file=str(env_file) if env_file else None, **values
+    )
+
+# Actions that change the bot for every user (flipping the buttons swaps ON/OFF for everyone) -
+# users limited to some devices may not use them
+HOUSEHOLD_ACTIONS = frozenset({"flip_state"})
+
+class AccessControl:
+    """Immutable set of authorized chat IDs with optional per-user limits"""
+    def __init__(self, chat_ids, permissions=None):
+        self.chat_ids = frozenset(chat_ids)
+        # chat_id -> (allowed devices or None, allowed actions or None); None means no limit
+        self.permissions = permissions or {}
+    
+    def allows(self, chat_id, action=None, device=None):
+        """O(1) check that a chat may use the bot, and the action/device if given"""
+        if chat_id not in self.chat_ids:
+            return False
+        limits = self.permissions.get(chat_id)
+        if limits is None:
+            return True
+        devices, actions = limits
+        if action and actions is not None and action not in actions:
+            return False
+        if action in HOUSEHOLD_ACTIONS and devices is not None:
+            return False
+        if device and devices is not None and device not in devices:
+            return False
+        return True
+
+def load_access_control(config):
+    """Build the ACL from the configured chat IDs and ACL_FILE.
+    
+    ACL_FILE is either a list of chat IDs or
+    {"users": {"<chat_id>": {"name": ..., "devices": [...], "actions": [...]}}}
+    where "devices" and "actions" are optional limits for that user. A
+    "devices" limit also rules out HOUSEHOLD_ACTIONS.
+    """
+    chat_ids = set(config.chat_ids)
+    permissions = {}
+    if config.acl_file:
+        with open(config.acl_file) as acl_fd:
+            data = json.load(acl_fd)
+        users = data.get("users", {}) if isinstance(data, dict) else {chat_id: {} for chat_id in data}
+        for chat_id, entry in users.items():
+            chat_id = int(chat_id)
+            chat_ids.add(chat_id)
+            if "devices" in entry or "actions" in entry:
+                devices = frozenset(entry["devices"]) if "devices" in entry else None
+                actions = frozenset(entry["actions"]) if "actions" in entry else None
+                permissions[chat_id] = (devices, actions)
+    
+    if not chat_ids:
+        raise ValueError("no authorized chat IDs configured")
+    return AccessControl(chat_ids, permissions)
 
 DEVICE_TYPE = DeviceType.BREEZE
 
-# Global variable for button logic state
-buttons_flipped = False
+# State each command puts the AC in: (power, mode, fan level, swing)
+COMMAND_STATES = {
+    "ON": (DeviceState.ON, ThermostatMode.COOL, ThermostatFanLevel.MEDIUM, ThermostatSwing.OFF),
+    "OFF": (DeviceState.OFF, None, None, None),
+}
 
-class ACController:
+class DeviceSnapshot(NamedTuple):
+    """Last known state of a Breeze device"""
+    power: DeviceState
+    mode: ThermostatMode
+    target_temperature: int
+    fan_level: ThermostatFanLevel
+    swing: ThermostatSwing
+    last_seen: float  # time.monotonic() of the update
+    source: str
+
+class DeviceStateCache:
+    """Last known state per device ID, fed by UDP broadcasts and state queries.
+    
+    Snapshots are never dropped when broadcasts are missed - they just age,
+    and get_fresh() only returns ones seen within stale_after seconds.
+    """
+    def __init__(self, stale_after=30.0):
+        self.stale_after = stale_after
+        self._states = {}
+    
+    def update(self, device_id, power, mode, target_temperature, fan_level, swing, source):
+        """Record the current state of a device"""
+        self._states[device_id] = DeviceSnapshot(
+            power, mode, target_temperature, fan_level, swing, time.monotonic(), source
+        )
+    
+    def update_from_device(self, device):
+        """SwitcherBridge callback - record every Breeze broadcast"""
+        if isinstance(device, SwitcherThermostat):
+            self.update(
+                device.device_id, device.device_state, device.mode,
+                device.target_temperature, device.fan_level, device.swing, "broadcast"
+            )
+    
+    def update_from_response(self, device_id, response):
+        """Record the reply of a get_breeze_state() query"""
+        self.update(
+            device_id, response.state, response.mode,
+            response.target_temperature, response.fan_level, response.swing, "query"
+        )
+    
+    def record_command(self, device_id, command):
+        """Record the state a successfully sent ON/OFF command put the device in"""
+        power = COMMAND_STATES[command][0]
+        previous = self._states.get(device_id)
+        if command == "OFF" and previous:
+            mode, fan_level, swing = previous.mode, previous.fan_level, previous.swing
+        else:
+            mode, fan_level, swing = COMMAND_STATES["ON"][1:]
+        target_temperature = previous.target_temperature if previous else 0
+        self.update(device_id, power, mode, target_temperature, fan_level, swing, "command")
+    
+    def invalidate(self, device_id):
+        """Forget a device's state after a command whose outcome is unknown"""
+        self._states.pop(device_id, None)
+    
+    def get(self, device_id):
+        """Last known snapshot of a device, fresh or not (None if never seen)"""
+        return self._states.get(device_id)
+    
+    def get_fresh(self, device_id):
+        """Snapshot of a device only if it was updated within stale_after seconds"""
+        snapshot = self._states.get(device_id)
+        if snapshot and time.monotonic() - snapshot.last_seen <= self.stale_after:
+            return snapshot
+        return None
+    
+    def describe(self, device_id):
+        """Human readable state line for a device"""
+        snapshot = self._states.get(device_id)
+        if not snapshot:
+            return "Unknown"
+        age = int(time.monotonic() - snapshot.last_seen)
+        stale = "" if age <= self.stale_after else " ⚠️ stale"
+        return (
+            f"{snapshot.power.display.upper()}, {snapshot.mode.display} {snapshot.target_temperature}°, "
+            f"fan {snapshot.fan_level.display}, swing {snapshot.swing.display} "
+            f"(seen {age}s ago{stale})"
+        )
+
+# Errors worth retrying - the device didn't answer, as opposed to answering with a failure
+TRANSIENT_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a device that is known to be offline"""
+
+class HedgeLostError(Exception):
+    """Raised by a hedged attempt that may not send because another attempt already did"""
+
+class DeadlineExceeded(Exception):
+    """Raised when the time budget of an update runs out, naming the phase it ran out in"""
+    def __init__(self, phase):
+        super().__init__(f"timed out during {phase}")
+        self.phase = phase
+
+class Deadline:
+    """Time budget created when an update arrives and passed down to the device I/O"""
+    __slots__ = ("budget", "expires_at")
+    
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+    
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+async def with_deadline(awaitable, deadline, phase, cap=None):
+    """Await with whatever is left of deadline, or at most cap seconds.
+    
+    Raises DeadlineExceeded when the deadline ran out and plain
+    asyncio.TimeoutError when only the cap did, so the caller may retry.
+    """
+    timeout, binding = cap, False
+    if deadline:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(phase)
+        if timeout is None or remaining < timeout:
+            timeout, binding = remaining, True
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if binding:
+            raise DeadlineExceeded(phase) from None
+        raise
+
+class CircuitBreaker:
+    """Per-device circuit breaker: closed -> open after repeated failures -> half-open probe.
+    
+    While open, calls fail at once instead of waiting out connect timeouts.
+    After reset_timeout a single probe call is let through - its success
+    closes the breaker again, its failure re-opens it.
+    """
+    __slots__ = ("name", "failure_threshold", "reset_timeout", "failures", "opened_at", "_probing")
+    
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+    
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go to the device"""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            logger.info(f"Probing {self.name} to see if it's back online")
+            return
+        retry_in = max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"{self.name} is offline, not retrying for {retry_in:.0f}s")
+    
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"{self.name} is back online")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                logger.warning(f"{self.name} looks offline, failing fast for {self.reset_timeout:.0f}s")
+            self.opened_at = time.monotonic()
+            self._probing = False
+    
+    def release_probe(self):
+        """Let another call probe when the current probe was cancelled"""
+        self._probing = False
+
+def retry_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with full jitter for the attempt-th retry"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class PooledSession:
+    """A connected SwitcherApi kept open between commands"""
+    __slots__ = ("api", "lock", "last_used", "keepalive_task")
+    
+    def __init__(self, api):
+        self.api = api
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.keepalive_task = None
+
+class SwitcherConnectionPool:
+    """Keep one open Switcher session per (IP, device ID, key) instead of connecting per tap"""
+    def __init__(self, config, state_cache, is_configured=None):
+        self.config = config
+        self.state_cache = state_cache
+        # key -> whether the device is still configured (every key is by default)
+        self._is_configured = is_configured or (lambda key: True)
+        self._sessions = {}
+        self._connect_locks = {}
+        self._breakers = {}
+        self._warm_states = {}
+        self._warm_tasks = {}
+        self._background = set()  # evictions started where they can't be awaited
+    
+    def _spawn(self, coro):
+        """Run coro as a task that stays referenced until done - close() waits for it"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+    
+    async def _get_session(self, key, deadline=None):
+        """Return (session, reused) - reuse a live session or open a new one"""
+        session = self._sessions.get(key)
+        if session and session.api.connected:
+            return session, True
+        
+        async with self._connect_locks.setdefault(key, asyncio.Lock()):
+            session = self._sessions.get(key)
+            if session and session.api.connected:
+                return session, True
+            
+            ip, device_id, device_key = key
+            from aioswitcher.api import SwitcherApi
+            api = SwitcherApi(DEVICE_TYPE, ip, device_id, device_key)
+            await with_deadline(api.connect(), deadline, "connect", cap=self.config.connect_timeout)
+            session = PooledSession(api)
+            session.keepalive_task = asyncio.create_task(self._keepalive(key, session))
+            self._sessions[key] = session
+            if self._warm_states.get(key) != "warming up":
+                self._warm_states.pop(key, None)  # an earlier failed warm-up is over now
+            logger.info(f"Opened pooled connection to {ip}")
+            return session, False
+    
+    def breaker(self, ip, device_id, device_key):
+        """Circuit breaker of a device, created on first use"""
+        key = (ip, device_id, device_key)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(
+                ip, self.config.breaker_failure_threshold, self.config.breaker_reset_timeout
+            )
+        return breaker
+    
+    async def run(self, ip, device_id, device_key, operation, deadline=None, claim=None):
+        """Run operation(api) on a device, retrying transient errors with jittered backoff.
+        
+        Raises CircuitOpenError at once while the device's breaker is open.
+        Errors the device answered with aren't retried and don't count as the
+        device being offline. With a deadline, connecting and running the
+        operation share its budget and no retry is started past it. An
+        operation that mustn't be repeated takes claim before writing - once
+        it's taken, a failure is raised as is, without retrying or reconnecting.
+        """
+        key = (ip, device_id, device_key)
+        breaker = self.breaker(*key)
+        retries = self.config.device_retries
+        for attempt in range(retries + 1):
+            breaker.before_call()
+            try:
+                result = await self._run_once(key, operation, deadline, claim)
+            except TRANSIENT_ERRORS as e:
+                breaker.record_failure()
+                delay = retry_delay(attempt, self.config.retry_base_delay, self.config.retry_max_delay)
+                if attempt == retries or breaker.state != "closed" or (claim and claim.taken):
+                    raise
+                if deadline and deadline.remaining() <= delay:
+                    raise
+                logger.warning(f"Device {ip} unreachable ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except DeadlineExceeded:
+                breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                raise
+            except Exception:
+                breaker.record_success()  # it answered, so it's online
+                raise
+            else:
+                breaker.record_success()
+                return result
+    
+    async def _run_once(self, key, operation, deadline=None, claim=None):
+        """Run operation(api) on the pooled session for a device.
+        
+        A reused session may have been dropped by the device since the last
+        command, so a failure on it reconnects once and retries - unless the
+        operation already took claim.
+        """
+        ip = key[0]
+        session, reused = await self._get_session(key, deadline)
+        try:
+            return await self._run_on(key, session, operation, deadline)
+        except HedgeLostError:
+            raise  # the session is fine, another attempt just got there first
+        except DeadlineExceeded:
+            raise  # the cancelled operation already evicted the session
+        except Exception as e:
+            await self._evict(key, session)
+            if not reused or (claim and claim.taken):
+                raise
+            logger.warning(f"Pooled connection to {ip} failed ({e}), reconnecting")
+        
+        session, _ = await self._get_session(key, deadline)
+        return await self._run_on(key, session, operation, deadline)
+    
+    async def _run_on(self, key, session, operation, deadline=None):
+        """Run operation(api) holding the session lock - operation bounds its own I/O by deadline"""
+        await with_deadline(session.lock.acquire(), deadline, "session wait")
+        try:
+            session.last_used = time.monotonic()
+            return await operation(session.api)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # A reply may still be on its way - the next command mustn't read it
+            self._spawn(self._evict(key, session))
+            raise
+        finally:
+            session.lock.release()
+    
+    async def run_fresh(self, ip, device_id, device_key, operation, deadline=None):
+        """Run operation(api) on a new connection outside the pool - used for hedged attempts"""
+        from aioswitcher.api import SwitcherApi
+        api = SwitcherApi(DEVICE_TYPE, ip, device_id, device_key)
+        try:
+            await with_deadline(api.connect(), deadline, "connect", cap=self.config.connect_timeout)
+            return await operation(api)
+        finally:
+            try:
+                await api.disconnect()
+            except Exception as e:
+                logger.debug(f"Error closing hedged connection to {ip}: {e}")
+    
+    async def _keepalive(self, key, session):
+        """Ping the device while the session is in use, close it once idle"""
+        try:
+            while True:
+                await asyncio.sleep(self.config.pool_keepalive_interval)
+                if time.monotonic() - session.last_used >= self.config.pool_idle_timeout:
+                    logger.info(f"Closing idle connection to {key[0]}")
+                    if self.config.prewarm_sessions and self._is_configured(key):
+                        self.prewarm([key])  # reconnect so the next tap doesn't pay for it
+                    break
+                if session.lock.locked():
+                    continue  # a command is using the session right now
+                async with session.lock:
+                    response = await asyncio.wait_for(session.api.get_breeze_state(), self.config.connect_timeout)
+                self.state_cache.update_from_response(key[1], response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Keepalive to {key[0]} failed: {e}")
+        await self._evict(key, session)
+    
+    async def _evict(self, key, session):
+        """Drop a session from the pool and close its socket"""
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+        task = session.keepalive_task
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        try:
+            await session.api.disconnect()
+        except Exception as e:
+            logger.debug(f"Error closing connection to {key[0]}: {e}")
+    
+    def prewarm(self, keys):
+        """Open and log in sessions for (IP, device ID, key) tuples in the background"""
+        for key in keys:
+            if key in self._warm_tasks:
+                continue  # a failed warm-up is retried, a running one isn't doubled
+            self._warm_states[key] = "warming up"
+            task = asyncio.get_running_loop().create_task(self._warm(key))
+            self._warm_tasks[key] = task
+            task.add_done_callback(lambda task, key=key: self._warm_tasks.pop(key, None))
+    
+    async def _warm(self, key):
+        """Connect and log in, so the session is ready before the first command"""
+        session = self._sessions.get(key)
+        if session and session.api.connected:
+            self._warm_states.pop(key, None)
+            return
+        started = time.monotonic()
+        try:
+            await self.run(*key, check_login, Deadline(self.config.update_deadline))
+        except asyncio.CancelledError:
+            self._warm_states.pop(key, None)
+            raise
+        except Exception as e:
+            logger.warning(f"Warm-up of {key[0]} failed: {e}")
+            self._warm_states[key] = f"warm-up failed ({e})"
+            return
+        logger.info(f"Warmed up connection to {key[0]} in {time.monotonic() - started:.2f}s")
+        self._warm_states.pop(key, None)
+    
+    def session_state(self, ip, device_id, device_key):
+        """Human readable state of a device's pooled session"""
+        key = (ip, device_id, device_key)
+        session = self._sessions.get(key)
+        if session and session.api.connected:
+            return f"warm (used {time.monotonic() - session.last_used:.0f}s ago)"
+        return self._warm_states.get(key, "cold")
+    
+    def retire(self, keys, queues=()):
+        """Forget devices that are no longer configured, once the command queues in queues have drained.
+        
+        Their warm-up is cancelled, their session closed and their circuit
+        breaker dropped. Keys configured again by then are left alone.
+        """
+        self._spawn(self._retire(keys, queues))
+    
+    async def _retire(self, keys, queues):
+        for queue in queues:
+            await queue.drain()
+        for key in keys:
+            if self._is_configured(key):
+                continue
+            task = self._warm_tasks.get(key)
+            if task:
+                task.cancel()
+            session = self._sessions.get(key)
+            if session:
+                await self._evict(key, session)
+                logger.info(f"Closed the connection to removed device {key[0]}")
+            self._breakers.pop(key, None)
+            self._connect_locks.pop(key, None)
+            self._warm_states.pop(key, None)
+    
+    async def close(self):
+        """Cancel warm-ups and close every pooled session"""
+        for task in list(self._warm_tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        for key, session in list(self._sessions.items()):
+            await self._evict(key, session)
+
+class CommandResult(NamedTuple):
+    """Outcome of a queued device command"""
+    command: str
+    success: bool
+    skipped: bool = False  # True when the AC was already in the requested state
+    timed_out: bool = False  # True when the update's time budget ran out first
+
+class DeviceCommandQueue:
+    """Serialize commands to one device with a single writer.
+    
+    While a command is in flight only the newest submitted command is kept
+    pending (latest wins), and every caller that was waiting on a replaced
+    command gets the result of the one that was actually sent.
+    """
+    __slots__ = ("name", "_pending", "_waiters", "_worker")
+    
+    def __init__(self, name):
+        self.name = name
+        self._pending = None
+        self._waiters = []
+        self._worker = None
+    
+    @property
+    def busy(self):
+        """True while a command is being sent or waiting to be sent"""
+        return self._worker is not None and not self._worker.done()
+    
+    async def drain(self):
+        """Wait until no command is being sent or waiting to be sent"""
+        while self.busy:
+            await asyncio.wait({self._worker})
+    
+    def submit(self, command, operation):
+        """Queue operation() as the desired state - returns a future of CommandResult"""
+        future = asyncio.get_running_loop().create_future()
+        if self._pending:
+            logger.info(f"{self.name}: replacing pending {self._pending[0]} command with {command}")
+        self._pending = (command, operation)
+        self._waiters.append(future)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+        return future
+    
+    async def _drain(self):
+        """Send pending commands one at a time until none are left"""
+        while self._pending:
+            (command, operation), waiters = self._pending, self._waiters
+            self._pending, self._waiters = None, []
+            try:
+                result = CommandResult(command, await operation())
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(result)
+
+# Telegram limits callback_data to 64 bytes
+CALLBACK_DATA_LIMIT = 64
+
+class CallbackData(NamedTuple):
+    """Decoded inline button payload"""
+    action: str
+    device: str = ""
+    params: tuple = ()
+
+def encode_callback_data(action, device="", *params):
+    """Pack an action, optional device and parameters as action:device:p1,p2"""
+    data = action
+    if device or params:
+        data += f":{device}"
+    if params:
+        data += ":" + ",".join(str(param) for param in params)
+    if len(data.encode()) > CALLBACK_DATA_LIMIT:
+        raise ValueError(f"callback_data over {CALLBACK_DATA_LIMIT} bytes: {data}")
+    return data
+
+def decode_callback_data(data):
+    """Unpack callback_data built by encode_callback_data (plain action names too)"""
+    action, _, rest = data.partition(":")
+    device, _, params = rest.partition(":")
+    return CallbackData(action, device, tuple(params.split(",")) if params else ())
+
+def load_device_configs(config):
+    """Read DEVICES_FILE, or fall back to the single AC of the DEVICE_* variables.
+    
+    DEVICES_FILE is {"devices": [{"name", "ip", "device_id", "device_key", "remote_id"}, ...],
+                     "scenes": {"<scene>": {"<device name>": "ON" | "OFF", ...}}}
+    Returns (devices, scenes).
+    """
+    if not config.devices_file:
+        return [config.device], {}
+    
+    with open(config.devices_file) as devices_fd:
+        data = json.load(devices_fd)
+    devices = [
+        DeviceConfig(entry["name"], entry["ip"], entry["device_id"], entry["device_key"], entry["remote_id"])
+        for entry in data["devices"]
+    ]
+    if not devices:
+        raise ValueError("no devices configured")
+    names = [device.name for device in devices]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate device names in {config.devices_file}")
+    for name in names:
+        if ":" in name:
+            raise ValueError(f"device name can't contain ':': {name}")
+        encode_callback_data("turn_off", name)  # the name has to fit in callback_data
+    
+    scenes = data.get("scenes", {})
+    for scene, commands in scenes.items():
+        if "," in scene:
+            raise ValueError(f"scene name can't contain ',': {scene}")
+        encode_callback_data("scene", "", scene)
+        for name, command in commands.items():
+            if name not in names or command not in COMMAND_STATES:
+                raise ValueError(f"scene {scene}: bad entry {name}={command}")
+    return devices, scenes
+
+class RemoteCatalog:
+    """Breeze remote definitions of the configured ACs, parsed once and kept compact.
+    
+    aioswitcher's remote database is a ~13MB JSON file. It is parsed once for
+    all configured remotes and then dropped - only the SwitcherBreezeRemote
+    objects and their built commands are kept, so a tap never touches it.
+    With isolated=True it is parsed by a child process that hands back just
+    the configured remotes.
+    """
+    def __init__(self, db_path=None):
+        self._db_path = db_path  # aioswitcher's bundled database by default
+        self._remotes = {}
+        self._commands = {}
+        self._precomputed = {}  # remote ID -> command() arguments built by _precompute()
+        self._lock = threading.Lock()
+    
+    def preload(self, remote_ids, isolated=False):
+        """Parse and validate every remote in remote_ids that isn't loaded yet"""
+        with self._lock:
+            missing = sorted(set(remote_ids) - self._remotes.keys())
+            if not missing:
+                return
+            
+            started = time.monotonic()
+            from aioswitcher.api.remotes import BREEZE_REMOTE_DB_FPATH, SwitcherBreezeRemote
+            remotes_db = read_remote_db(self._db_path or BREEZE_REMOTE_DB_FPATH, missing, isolated)
+            for remote_id in missing:
+                if remotes_db.get(remote_id) is None:
+                    raise ValueError(f"Unknown Breeze remote ID: {remote_id}")
+                remote = SwitcherBreezeRemote(remotes_db[remote_id])
+                if ThermostatMode.COOL not in remote.modes_features:
+                    raise ValueError(f"Remote {remote_id} has no cool mode")
+                self._remotes[remote_id] = remote
+                if not self._precompute(remote_id, remote):
+                    del self._remotes[remote_id]
+                    raise ValueError(f"Remote {remote_id} can't build any ON/OFF command")
+            logger.info(f"Loaded remotes {', '.join(missing)} in {time.monotonic() - started:.2f}s")
+    
+    def _precompute(self, remote_id, remote):
+        """Build the ON/OFF commands for every temperature ahead of the first tap - returns how many built.
+        
+        Some remotes lack the IR code of a few combinations (build_command
+        raises KeyError) - those are skipped and fail only if actually sent.
+        """
+        mode, fan_level, swing = COMMAND_STATES["ON"][1:]
+        current_states = (DeviceState.ON, DeviceState.OFF) if remote.on_off_type else (None,)
+        built = []
+        for power, *_ in COMMAND_STATES.values():
+            for target_temp in range(remote.min_temperature, remote.max_temperature + 1):
+                for current_state in current_states:
+                    args = (power, mode, target_temp, fan_level, swing, current_state)
+                    try:
+                        self.command(remote_id, *args)
+                    except KeyError:
+                        continue
+                    built.append(args)
+        self._precomputed[remote_id] = tuple(built)
+        return len(built)
+    
+    def precomputed(self, remote_id):
+        """command() arguments of the ON/OFF commands built ahead of time for a remote"""
+        self.get(remote_id)
+        return self._precomputed.get(remote_id, ())
+    
+    def get(self, remote_id):
+        """Parsed remote definition, loaded on first use if it wasn't preloaded"""
+        if remote_id not in self._remotes:
+            self.preload([remote_id])
+        return self._remotes[remote_id]
+    
+    def command(self, remote_id, state, mode, target_temp, fan_level, swing, current_state=None):
+        """Memoized SwitcherBreezeRemote.build_command()"""
+        remote = self.get(remote_id)
+        if not remote.on_off_type:
+            current_state = None  # only toggle remotes depend on the previous state
+        key = (remote_id, state, mode, target_temp, fan_level, swing, current_state)
+        command = self._commands.get(key)
+        if command is None:
+            command = remote.build_command(state, mode, target_temp, fan_level, swing, current_state)
+            self._commands[key] = command
+        return command
+    
+    def swing_command(self, remote_id, swing):
+        """Memoized SwitcherBreezeRemote.build_swing_command()"""
+        key = (remote_id, swing)
+        command = self._commands.get(key)
+        if command is None:
+            command = self.get(remote_id).build_swing_command(swing)
+            self._commands[key] = command
+        return command
+    
+    def swing_toggles(self, remote_id):
+        """True when a remote's separate swing command is a toggle - FUN_d0 and FUN_d1 send the same code"""
+        if not self.get(remote_id).separated_swing_command:
+            return False
+        try:
+            return self.swing_command(remote_id, ThermostatSwing.ON).command == \
+                self.swing_command(remote_id, ThermostatSwing.OFF).command
+        except RuntimeError:
+            return False  # one of the codes is missing - it can't be sent at all
+
+# Prints the entries of a remote database (argv[1]) named by argv[2:] as JSON
+REMOTE_DB_READER = (
+    "import json, sys\n"
+    "with open(sys.argv[1]) as remotes_fd: remotes_db = json.load(remotes_fd)\n"
+    "print(json.dumps({remote_id: remotes_db.get(remote_id) for remote_id in sys.argv[2:]}))"
+)
+
+def read_remote_db(db_path, remote_ids, isolated=False):
+    """Entries of remote_ids in the remote database (None for unknown ones), read in a child process if isolated"""
+    if not isolated:
+        with open(db_path) as remotes_fd:
+            remotes_db = json.load(remotes_fd)
+        return {remote_id: remotes_db.get(remote_id) for remote_id in remote_ids}
+    reader = subprocess.run([sys.executable, "-c", REMOTE_DB_READER, str(db_path), *remote_ids],
+                            capture_output=True, text=True)
+    if reader.returncode:
+        raise OSError(f"remote database reader failed: {reader.stderr.strip().splitlines()[-1:]}")
+    return json.loads(reader.stdout)
+
+# Shared remote definitions - preloaded in post_init, lazily loaded otherwise
+remote_catalog = RemoteCatalog()
+
+# Byte offsets of the per-session fields in a Breeze control packet
+PACKET_SESSION_SLICE = slice(8, 12)
+PACKET_TIMESTAMP_SLICE = slice(24, 28)
+
+def sign_packet(packet):
+    """Append the two CRC signatures Switcher devices expect - bytes version of aioswitcher's signing"""
+    packet_crc = crc_hqx(packet, 0x1021).to_bytes(2, "little")
+    key_crc = crc_hqx(packet_crc + b"0" * 32, 0x1021).to_bytes(2, "little")
+    return bytes(packet) + packet_crc + key_crc
+
+class CommandPacketCache:
+    """Breeze control packets per device, built once with only the session fields left blank.
+    
+    Building a packet means an IR code lookup and a few hex format and
+    unhexlify passes. A cached packet just gets the session ID and timestamp
+    of the current login patched in and is signed.
+    """
     def __init__(self):
-        self.remote_manager = SwitcherBreezeRemoteManager()
+        self._packets = {}
     
-    async def toggle_ac(self):
-        """Send toggle command to AC"""
+    def get(self, device_id, remote_id, state, mode, target_temp, fan_level, swing, current_state=None):
+        """Packet template for a fully resolved Breeze state"""
+        if not remote_catalog.get(remote_id).on_off_type:
+            current_state = None  # only toggle remotes depend on the previous state
+        key = (device_id, remote_id, state, mode, target_temp, fan_level, swing, current_state)
+        packet = self._packets.get(key)
+        if packet is None:
+            command = remote_catalog.command(remote_id, state, mode, target_temp, fan_level, swing, current_state)
+            packet = self._packets[key] = self._compile(device_id, command)
+        return packet
+    
+    def get_swing(self, device_id, remote_id, swing):
+        """Packet template for the separate swing command of special swing remotes"""
+        key = (device_id, remote_id, swing)
+        packet = self._packets.get(key)
+        if packet is None:
+            command = remote_catalog.swing_command(remote_id, swing)
+            packet = self._packets[key] = self._compile(device_id, command)
+        return packet
+    
+    def precompile(self, device):
+        """Build the packets of the ON/OFF commands RemoteCatalog precomputed for a device's remote"""
+        if remote_catalog.get(device.remote_id).separated_swing_command:
+            *_, swing = COMMAND_STATES["ON"]
+            self.get_swing(device.device_id, device.remote_id, swing)
+        for args in remote_catalog.precomputed(device.remote_id):
+            self.get(device.device_id, device.remote_id, *args)
+    
+    @staticmethod
+    def _compile(device_id, command):
+        """Length-prefixed packet bytes with zeroed session ID and timestamp"""
+        from aioswitcher.api import packets
+        from aioswitcher.device.tools import set_message_length
+        packet = packets.BREEZE_COMMAND_PACKET.format("00000000", "00000000", device_id, command.length, command.command)
+        return bytes.fromhex(set_message_length(packet))
+    
+    @staticmethod
+    def fill(packet, session_id, timestamp):
+        """Patch the session fields of a template and sign it"""
+        packet = bytearray(packet)
+        packet[PACKET_SESSION_SLICE] = session_id
+        packet[PACKET_TIMESTAMP_SLICE] = timestamp
+        return sign_packet(packet)
+
+packet_cache = CommandPacketCache()
+
+async def check_login(api, deadline=None):
+    """Log in to the device - raises if it refuses"""
+    _, login_resp = await with_deadline(api._login(), deadline, "login")
+    if not login_resp.successful:
+        raise RuntimeError("login request was not successful")
+
+class SendClaim:
+    """Shared by the attempts of a hedged command so that only one of them ever sends it"""
+    __slots__ = ("taken",)
+    
+    def __init__(self):
+        self.taken = False
+    
+    def take(self):
+        if self.taken:
+            raise HedgeLostError("command already sent by another attempt")
+        self.taken = True
+
+async def send_compiled_packets(api, templates, claim=None, deadline=None):
+    """Log in and send cached packet templates over an open SwitcherApi connection"""
+    from aioswitcher.api.messages import SwitcherBaseResponse
+    timestamp, login_resp = await with_deadline(api._login(), deadline, "login")
+    if not login_resp.successful:
+        raise RuntimeError("login request was not successful")
+    if claim:
+        claim.take()
+    
+    session_id, timestamp = bytes.fromhex(login_resp.session_id), bytes.fromhex(timestamp)
+    for template in templates:
+        api._writer.write(CommandPacketCache.fill(template, session_id, timestamp))
+        response = SwitcherBaseResponse(await with_deadline(api._reader.read(1024), deadline, "command"))
+        if not response.successful:
+            raise RuntimeError("control request was not successful")
+    return response
+
+class LatencyTracker:
+    """Latencies of the last few device commands, for picking the hedging delay"""
+    __slots__ = ("_samples", "min_samples", "percentile", "default_delay")
+    
+    def __init__(self, window=100, min_samples=20, percentile=95.0, default_delay=1.5):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.default_delay = default_delay
+    
+    def record(self, seconds):
+        self._samples.append(seconds)
+    
+    def hedge_delay(self):
+        """percentile of the recorded latencies, or default_delay while there are too few"""
+        if len(self._samples) < self.min_samples:
+            return self.default_delay
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+
+class ACController:
+    __slots__ = ("device", "config", "pool", "state_cache", "command_queue", "latency", "_commands")
+    
+    def __init__(self, device, config, pool, state_cache):
+        self.device = device
+        self.config = config
+        self.pool = pool
+        self.state_cache = state_cache
+        self.command_queue = DeviceCommandQueue(device.name)
+        self.latency = LatencyTracker(
+            config.hedge_window, config.hedge_min_samples, config.hedge_percentile, config.hedge_delay
+        )
+        self._commands = {"ON": self.turn_on_ac, "OFF": self.turn_off_ac}
+    
+    async def send_command(self, command, force=False, deadline=None):
+        """Queue an ON/OFF command - returns the CommandResult of what was actually sent.
+        
+        When the AC is known to already be in the requested state the command
+        is skipped without touching the network, unless force is set. Every
+        queued command carries its caller's deadline, so waiting on the queue
+        is bounded too.
+        """
+        if not force and self.config.skip_redundant_commands and self._already_in_state(command):
+            logger.info(f"{self.device.name} already {command}, skipping command")
+            return CommandResult(command, True, skipped=True)
         try:
-            logger.info(f"Sending toggle command to AC at {DEVICE_IP}")
-            async with SwitcherApi(DEVICE_TYPE, DEVICE_IP, DEVICE_ID, DEVICE_KEY) as api:
-                remote = self.remote_manager.get_remote(REMOTE_ID)
-                
-                await api.control_breeze_device(
-                    remote, 
-                    DeviceState.ON,
-                    ThermostatMode.COOL,
-                    0,  # Let AC use last temperature setting
-                    ThermostatFanLevel.MEDIUM,
-                    ThermostatSwing.OFF
+            return await self.command_queue.submit(command, lambda: self._run_command(command, deadline))
+        except DeadlineExceeded as e:
+            logger.warning(f"{self.device.name}: {command} command {e}")
+            return CommandResult(command, False, timed_out=True)
+    
+    def _already_in_state(self, command):
+        """True if a fresh cached state matches what command would set"""
+        if self.command_queue.busy:
+            return False  # the cached state is about to change
+        snapshot = self.state_cache.get_fresh(self.device.device_id)
+        if not snapshot:
+            return False
+        power, mode, fan_level, swing = COMMAND_STATES[command]
+        if power == DeviceState.OFF:
+            return snapshot.power == DeviceState.OFF
+        return (snapshot.power, snapshot.mode, snapshot.fan_level, snapshot.swing) == (power, mode, fan_level, swing)
+    
+    async def _run_command(self, command, deadline=None):
+        """Send a queued command and remember the state it set"""
+        success = await self._commands[command](deadline)
+        if success:
+            self.state_cache.record_command(self.device.device_id, command)
+        return success
+    
+    async def _control_breeze(self, *command, deadline=None):
+        """Send a Breeze control command over the pooled connection"""
+        device = self.device
+        templates = self._cached_packets(*command)
+        if not templates:
+            remote = remote_catalog.get(device.remote_id)
+            await self.pool.run(
+                device.ip, device.device_id, device.device_key,
+                lambda api: with_deadline(api.control_breeze_device(remote, *command), deadline, "command"), deadline
+            )
+            return
+        
+        # The packets were built from the cached state - if they aren't idempotent, they may
+        # be sent only once, so a send that fails after writing isn't retried
+        claim = None if self._idempotent(templates) else SendClaim()
+        started = time.monotonic()
+        try:
+            if self.config.hedge_requests:
+                await self._send_hedged(templates, claim, deadline)
+            else:
+                await self.pool.run(
+                    device.ip, device.device_id, device.device_key,
+                    lambda api: send_compiled_packets(api, templates, claim, deadline), deadline, claim
                 )
-                
-                logger.info(f"Toggle command sent successfully")
-                return True
+        except Exception:
+            if claim and claim.taken:
+                # It may or may not have been applied - let the next command query the state
+                self.state_cache.invalidate(device.device_id)
+            raise
+        self.latency.record(time.monotonic() - started)
+    
+    def _idempotent(self, templates):
+        """False when sending the packets twice would undo them - a toggle remote's ON/OFF code,
+        or a separate swing command that toggles"""
+        remote_id = self.device.remote_id
+        if remote_catalog.get(remote_id).on_off_type:
+            return False
+        # Templates after the first are the separate swing command
+        return len(templates) == 1 or not remote_catalog.swing_toggles(remote_id)
+    
+    async def _send_hedged(self, templates, claim=None, deadline=None):
+        """Send cached packets, racing a second attempt on a fresh connection if the first is slow.
+        
+        Commands that aren't idempotent pass a claim shared by the attempts,
+        so only the first to log in may send. Once the first attempt has sent,
+        no hedge is started at all.
+        """
+        device = self.device
+        key = (device.ip, device.device_id, device.device_key)
+        primary = asyncio.ensure_future(
+            self.pool.run(*key, lambda api: send_compiled_packets(api, templates, claim, deadline), deadline, claim)
+        )
+        pending = {primary}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.latency.hedge_delay())
+            if done or (claim and claim.taken):
+                return await primary
+            
+            logger.info(f"{device.name} is slow to answer, hedging on a fresh connection")
+            pending.add(asyncio.ensure_future(
+                self.pool.run_fresh(*key, lambda api: send_compiled_packets(api, templates, claim, deadline), deadline)
+            ))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    if not isinstance(task.exception(), HedgeLostError):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _cached_packets(self, state, mode=None, target_temp=0, fan_level=None, swing=None):
+        """Cached packets for a command, or None if the current state needed to resolve it is unknown.
+        
+        Mirrors how control_breeze_device() fills unset fields from the
+        device's state - but from a fresh cached snapshot, which saves
+        building the packet and the get-state round trip.
+        """
+        snapshot = self.state_cache.get_fresh(self.device.device_id)
+        if not snapshot:
+            return None
+        remote = remote_catalog.get(self.device.remote_id)
+        mode = mode or snapshot.mode
+        target_temp = target_temp or snapshot.target_temperature
+        fan_level = fan_level or snapshot.fan_level
+        set_swing = ThermostatSwing.OFF if remote.separated_swing_command else swing or snapshot.swing
+        if None in (snapshot.power, mode, fan_level, set_swing) or not target_temp:
+            return None
+        
+        device_id, remote_id = self.device.device_id, self.device.remote_id
+        templates = [packet_cache.get(device_id, remote_id, state, mode, target_temp, fan_level, set_swing, snapshot.power)]
+        if remote.separated_swing_command and swing:
+            templates.append(packet_cache.get_swing(device_id, remote_id, swing))
+        return templates
+    
+    async def toggle_ac(self, deadline=None):
+        """Send toggle command to AC"""
+        try:
+            logger.info(f"Sending toggle command to {self.device.name} at {self.device.ip}")
+            await self._control_breeze(
+                DeviceState.ON,
+                ThermostatMode.COOL,
+                0,  # Let AC use last temperature setting
+                ThermostatFanLevel.MEDIUM,
+                ThermostatSwing.OFF,
+                deadline=deadline
+            )
+            
+            logger.info(f"Toggle command sent successfully")
+            return True
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error sending toggle command: {e}")
             return False
     
-    async def turn_on_ac(self):
+    async def turn_on_ac(self, deadline=None):
         """Always turn AC ON"""
         try:
-            logger.info(f"Turning AC ON at {DEVICE_IP}")
-            async with SwitcherApi(DEVICE_TYPE, DEVICE_IP, DEVICE_ID, DEVICE_KEY) as api:
-                remote = self.remote_manager.get_remote(REMOTE_ID)
-                
-                await api.control_breeze_device(
-                    remote, 
-                    DeviceState.ON,
-                    ThermostatMode.COOL,
-                    0,  # Let AC use last temperature setting
-                    ThermostatFanLevel.MEDIUM,
-                    ThermostatSwing.OFF
-                )
-                
-                logger.info(f"AC ON command sent successfully")
-                return True
+            logger.info(f"Turning {self.device.name} ON at {self.device.ip}")
+            await self._control_breeze(
+                DeviceState.ON,
+                ThermostatMode.COOL,
+                0,  # Let AC use last temperature setting
+                ThermostatFanLevel.MEDIUM,
+                ThermostatSwing.OFF,
+                deadline=deadline
+            )
+            
+            logger.info(f"AC ON command sent successfully")
+            return True
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error turning AC ON: {e}")
             return False
     
-    async def turn_off_ac(self):
+    async def turn_off_ac(self, deadline=None):
         """Always turn AC OFF"""
         try:
-            logger.info(f"Turning AC OFF at {DEVICE_IP}")
-            async with SwitcherApi(DEVICE_TYPE, DEVICE_IP, DEVICE_ID, DEVICE_KEY) as api:
-                remote = self.remote_manager.get_remote(REMOTE_ID)
-                
-                await api.control_breeze_device(
-                    remote, 
-                    DeviceState.OFF
-                )
-                
-                logger.info(f"AC OFF command sent successfully")
-                return True
+            logger.info(f"Turning {self.device.name} OFF at {self.device.ip}")
+            await self._control_breeze(DeviceState.OFF, deadline=deadline)
+            
+            logger.info(f"AC OFF command sent successfully")
+            return True
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error turning AC OFF: {e}")
             return False
+
+async def flip_switcher_state(runtime):
+    """Flip button logic in the bot (no communication with Switcher)"""
+    runtime.buttons_flipped = not runtime.buttons_flipped
+    logger.info(f"Button logic flipped. Buttons flipped: {runtime.buttons_flipped}")
+    return True
+
+class DeviceRegistry:
+    """Configured ACs indexed by name and device ID, with lazily created controllers"""
+    def __init__(self, devices, scenes, controller_factory):
+        self._controller_factory = controller_factory  # DeviceConfig -> ACController
+        self._controllers = {}
+        self.load(devices, scenes)
     
-    async def flip_switcher_state(self):
-        """Flip button logic in the bot (no communication with Switcher)"""
-        global buttons_flipped
-        buttons_flipped = not buttons_flipped
-        logger.info(f"Button logic flipped. Buttons flipped: {buttons_flipped}")
-        return True
+    def load(self, devices, scenes):
+        """Swap in a new device list - returns the controllers it dropped.
+        
+        Controllers of unchanged devices are kept. Controllers of changed or
+        removed devices are only dropped from the registry, so commands they
+        are already sending still finish.
+        """
+        by_name = {device.name: device for device in devices}
+        by_id = {device.device_id: device for device in devices}
+        controllers = {
+            name: controller for name, controller in self._controllers.items()
+            if by_name.get(name) == controller.device
+        }
+        dropped = [controller for name, controller in self._controllers.items() if name not in controllers]
+        self.names = tuple(by_name)
+        self.default_name = self.names[0]
+        self.scenes = scenes
+        self.pool_keys = frozenset(device.pool_key for device in devices)
+        self._by_name, self._by_id, self._controllers = by_name, by_id, controllers
+        return dropped
+    
+    def __len__(self):
+        return len(self._by_name)
+    
+    def get(self, name_or_id):
+        """DeviceConfig by name or device ID, the default AC for an empty name"""
+        if not name_or_id:
+            name_or_id = self.default_name
+        return self._by_name.get(name_or_id) or self._by_id.get(name_or_id)
+    
+    def controller(self, name_or_id):
+        """ACController for a device, created on first use (None for unknown devices)"""
+        device = self.get(name_or_id)
+        if device is None:
+            return None
+        controller = self._controllers.get(device.name)
+        if controller is None:
+            controller = self._controllers[device.name] = self._controller_factory(device)
+        return controller
+    
+    def devices(self):
+        """All configured devices in config order"""
+        return [self._by_name[name] for name in self.names]
 
-# Initialize AC controller
-ac = ACController()
+class BotRuntime:
+    """Everything a running bot works with: its config, the ACL, the ACs and their sessions.
+    
+    Built from a BotConfig by build_application() and kept in
+    application.bot_data["runtime"], where the handlers pick it up.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.acl = load_access_control(config)
+        self.state_cache = DeviceStateCache(config.state_stale_after)
+        self.pool = SwitcherConnectionPool(config, self.state_cache, lambda key: key in self.registry.pool_keys)
+        self.registry = DeviceRegistry(
+            *load_device_configs(config),
+            lambda device: ACController(device, config, self.pool, self.state_cache)
+        )
+        self.rendered_messages = RenderedMessageCache(config.edit_cache_size)
+        # The menu only changes when devices are reloaded, so it is built and serialized
+        # once per device list. The Bot API takes reply_markup as a JSON string, and
+        # python-telegram-bot sends string values as-is instead of re-serializing objects.
+        self.control_menu = serialize_markup(build_control_menu(self.registry))
+        self.buttons_flipped = False
+        self.state_bridge = None
+        self.config_watcher = None
+        self.memory_reporter = None
+    
+    def reload_access_control(self):
+        """Re-read .env and ACL_FILE and swap the ACL in - the current one stays on errors"""
+        try:
+            config = load_config(self.config.env_file) if self.config.env_file else self.config
+            acl = load_access_control(config)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"ACL reload failed, keeping current ACL: {e}")
+            return
+        self.acl = acl
+        logger.info(f"ACL reloaded: {len(acl.chat_ids)} authorized chats")
+    
+    def reload_devices(self):
+        """Re-read DEVICES_FILE and swap the registry contents - the current ones stay on errors"""
+        try:
+            devices, scenes = load_device_configs(self.config)
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"Device reload failed, keeping current devices: {e}")
+            return
+        old_keys = self.registry.pool_keys
+        dropped = self.registry.load(devices, scenes)
+        self.control_menu = serialize_markup(build_control_menu(self.registry))
+        logger.info(f"Devices reloaded: {', '.join(self.registry.names)}")
+        asyncio.get_running_loop().create_task(self.preload_remotes())
+        self.prewarm()
+        # Sessions of removed or re-keyed devices are closed once their commands are done
+        removed = old_keys - self.registry.pool_keys
+        if removed:
+            self.pool.retire(removed, [controller.command_queue for controller in dropped])
+    
+    def reload_config(self):
+        """Reload the ACL and the device list"""
+        self.reload_access_control()
+        if self.config.devices_file:
+            self.reload_devices()
+    
+    async def preload_remotes(self):
+        """Parse the remotes of all configured ACs off the event loop"""
+        remote_ids = [device.remote_id for device in self.registry.devices()]
+        try:
+            await asyncio.to_thread(remote_catalog.preload, remote_ids, self.config.isolate_remote_db)
+            for device in self.registry.devices():
+                packet_cache.precompile(device)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading Breeze remotes: {e}")
+    
+    def prewarm(self):
+        """Open the sessions of all configured ACs in the background, unless PREWARM_SESSIONS is off"""
+        if self.config.prewarm_sessions:
+            self.pool.prewarm(device.pool_key for device in self.registry.devices())
+
+async def fan_out_commands(config, targets, force=False):
+    """Send commands to several ACs at once, yielding (device name, CommandResult) as each finishes.
+    
+    targets is a list of (controller, command). At most FANOUT_CONCURRENCY
+    ACs are commanded at a time, and each gets FANOUT_DEVICE_TIMEOUT from
+    the moment its turn comes - one that runs out yields a timed out result.
+    """
+    semaphore = asyncio.Semaphore(config.fanout_concurrency)
+    
+    async def run(controller, command):
+        async with semaphore:
+            deadline = Deadline(config.fanout_device_timeout)
+            result = await controller.send_command(command, force=force, deadline=deadline)
+            return controller.device.name, result
+    
+    tasks = [asyncio.create_task(run(controller, command)) for controller, command in targets]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Reached when the consumer stops early and closes the generator too
+        for task in tasks:
+            task.cancel()
 
 def get_system_info():
     """Get system information for monitoring"""
@@ -198,29 +1623,85 @@ def get_system_info():
         logger.error(f"Error getting system info: {e}")
         return {"deployment": "Unknown", "error": str(e)}
 
-def check_authorization(update: Update) -> bool:
-    """Check if user is authorized"""
+def check_authorization(runtime, update: "Update", action=None, device=None) -> bool:
+    """Check if user is authorized (for the action and device, if given)"""
     user_id = update.effective_chat.id
-    authorized = user_id in AUTHORIZED_CHAT_IDS
+    authorized = runtime.acl.allows(user_id, action, device)
     if not authorized:
-        logger.warning(f"Unauthorized access attempt from user ID: {user_id}")
+        logger.warning(f"Unauthorized access attempt from user ID: {user_id} (action: {action}, device: {device})")
     return authorized
 
-def get_control_menu():
-    """Create AC control menu with on, off, and flip state buttons"""
-    keyboard = [
-        [
-            InlineKeyboardButton("🟢 Turn ON", callback_data="turn_on"),
-            InlineKeyboardButton("🔴 Turn OFF", callback_data="turn_off")
-        ],
-        [InlineKeyboardButton("🔄 Flip AC State", callback_data="flip_state")]
-    ]
+def build_control_menu(registry):
+    """Create AC control menu with on, off, and flip state buttons (a row per AC when there are several)"""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    if len(registry) == 1:
+        keyboard = [[
+            InlineKeyboardButton("🟢 Turn ON", callback_data=encode_callback_data("turn_on")),
+            InlineKeyboardButton("🔴 Turn OFF", callback_data=encode_callback_data("turn_off"))
+        ]]
+    else:
+        keyboard = [
+            [
+                InlineKeyboardButton(f"🟢 {name} ON", callback_data=encode_callback_data("turn_on", name)),
+                InlineKeyboardButton(f"🔴 {name} OFF", callback_data=encode_callback_data("turn_off", name))
+            ]
+            for name in registry.names
+        ]
+        keyboard.append([InlineKeyboardButton("⛔ All OFF", callback_data=encode_callback_data("all_off"))])
+    if registry.scenes:
+        keyboard.append([
+            InlineKeyboardButton(f"🎬 {scene}", callback_data=encode_callback_data("scene", "", scene))
+            for scene in registry.scenes
+        ])
+    keyboard.append([InlineKeyboardButton("🔄 Flip AC State", callback_data=encode_callback_data("flip_state"))])
     return InlineKeyboardMarkup(keyboard)
 
+def serialize_markup(markup):
+    """Compact JSON of a reply markup"""
+    return json.dumps(markup.to_dict(), separators=(",", ":"))
+
+class RenderedMessageCache:
+    """Bounded LRU of the last (text, markup hash) rendered per (chat_id, message_id)"""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._rendered = OrderedDict()
+    
+    def get(self, key):
+        """Last rendering of a message, or None if it isn't remembered"""
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            self._rendered.move_to_end(key)
+        return rendered
+    
+    def put(self, key, rendered):
+        """Remember the rendering of a message, evicting the least recently used one"""
+        self._rendered[key] = rendered
+        self._rendered.move_to_end(key)
+        if len(self._rendered) > self.maxsize:
+            self._rendered.popitem(last=False)
+
+async def edit_message(runtime, query, text, reply_markup=None):
+    """Edit the tapped message unless it already shows exactly this text and keyboard"""
+    from telegram.error import BadRequest
+    key = (query.message.chat.id, query.message.message_id)
+    rendered = (text, hash(reply_markup) if reply_markup else None)
+    if runtime.rendered_messages.get(key) == rendered:
+        logger.debug(f"Skipping unchanged edit of message {key}")
+        return
+    
+    try:
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        # Telegram refuses edits that change nothing - the message is already right
+        if "not modified" not in str(e).lower():
+            raise
+    runtime.rendered_messages.put(key, rendered)
+
 # Command handlers
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def start(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
     """Start command with toggle menu"""
-    if not check_authorization(update):
+    runtime = context.bot_data["runtime"]
+    if not check_authorization(runtime, update):
         await update.message.reply_text("❌ Unauthorized access")
         return
     
@@ -230,104 +1711,226 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         welcome_text,
-        reply_markup=get_control_menu(),
+        reply_markup=runtime.control_menu,
         parse_mode='Markdown'
     )
 
-async def where_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def where_command(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
     """Show system information"""
-    if not check_authorization(update):
+    runtime = context.bot_data["runtime"]
+    if not check_authorization(runtime, update):
         await update.message.reply_text("❌ Unauthorized access")
         return
     
+    from telegram.helpers import escape_markdown
     info = get_system_info()
     
     message = f"""🖥️ **System Information**
 
 **Deployment:** {info['deployment']}
 **Started:** {info.get('start_time', 'Unknown')}
-**Device IP:** {DEVICE_IP}
-**Device ID:** {DEVICE_ID}
+**Memory:** {describe_memory()} ({runtime.config.profile} profile)
+"""
+    for device in runtime.registry.devices():
+        # Names and error texts from the devices may contain _ or * - unescaped they break the Markdown
+        message += f"""
+**{escape_markdown(device.name)}** ({device.ip}, ID {escape_markdown(device.device_id)})
+**AC State:** {escape_markdown(runtime.state_cache.describe(device.device_id))}
+**Link:** {runtime.pool.breaker(*device.pool_key).state}
+**Session:** {escape_markdown(runtime.pool.session_state(*device.pool_key))}
 """
     
     await update.message.reply_text(message, parse_mode='Markdown')
 
-async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle inline keyboard callbacks"""
-    global buttons_flipped
+def format_command_result(runtime, result, device_name):
+    """Status line for a finished ON/OFF command"""
+    # Only name the AC when there is more than one
+    prefix = f"{device_name}: " if len(runtime.registry) > 1 else ""
+    if result.skipped:
+        return f"✅ {device_name if prefix else 'AC'} is already {result.command}"
+    if result.success:
+        return f"✅ {prefix}{result.command} command sent!"
+    if result.timed_out:
+        return f"⏱️ {prefix}AC didn't answer the {result.command} command in time"
+    return f"❌ {prefix}Failed to send {result.command} command"
+
+async def confirm_command(runtime, query, controller, command, command_task):
+    """Wait for a background device command and report its outcome in one final edit"""
+    confirm_deadline = runtime.config.confirm_deadline
+    try:
+        result = await asyncio.wait_for(asyncio.shield(command_task), confirm_deadline)
+        message = format_command_result(runtime, result, controller.device.name)
+    except asyncio.TimeoutError:
+        logger.warning(f"{command} command not confirmed within {confirm_deadline}s")
+        message = f"⏳ AC didn't confirm the {command} command in time - check it before trying again"
+    except Exception as e:
+        logger.error(f"Error sending {command} command: {e}")
+        message = f"❌ Failed to send {command} command"
+    
+    await edit_message(runtime, query, message, reply_markup=runtime.control_menu)
+
+async def show_interim_status(runtime, query, text):
+    """Answer the callback and show that the command is on its way"""
+    if runtime.config.callback_response == "edit":
+        await query.answer()
+        await edit_message(runtime, query, text)
+    else:
+        await query.answer(text)
+
+async def send_power_command(update, context, controller, command, sending_text, deadline):
+    """Send an ON/OFF command to one AC and report the outcome on the tapped message"""
+    runtime = context.bot_data["runtime"]
+    query = update.callback_query
+    # Flipped buttons mean the device state can't be trusted - always send
+    force = runtime.buttons_flipped
     
-    if not check_authorization(update):
-        await update.callback_query.answer("❌ Unauthorized access")
+    if runtime.config.optimistic_responses:
+        # Start the device command first so Telegram calls never delay it
+        command_task = context.application.create_task(controller.send_command(command, force=force, deadline=deadline), update=update)
+        await show_interim_status(runtime, query, sending_text)
+        context.application.create_task(confirm_command(runtime, query, controller, command, command_task), update=update)
         return
     
+    # The interim status goes out while the device command runs
+    status, result = await asyncio.gather(
+        show_interim_status(runtime, query, sending_text),
+        controller.send_command(command, force=force, deadline=deadline),
+        return_exceptions=True
+    )
+    if isinstance(status, Exception):
+        logger.warning(f"Failed to show interim status: {status}")
+    if isinstance(result, Exception):
+        raise result
+    
+    message = format_command_result(runtime, result, controller.device.name)
+    await edit_message(runtime, query, message, reply_markup=runtime.control_menu)
+
+# Callback action -> (handler(update, context, callback, deadline), per_device), filled by @callback_route
+CALLBACK_ROUTES = {}
+
+def callback_route(action, per_device=False):
+    """Register a handler for an inline button action (per_device actions target one AC)"""
+    def register(handler):
+        CALLBACK_ROUTES[action] = (handler, per_device)
+        return handler
+    return register
+
+@callback_route("turn_on", per_device=True)
+async def turn_on_callback(update, context, callback, deadline):
+    """ON button"""
+    runtime = context.bot_data["runtime"]
+    # Send OFF command when buttons are flipped, ON normally
+    command = "OFF" if runtime.buttons_flipped else "ON"
+    controller = runtime.registry.controller(callback.device)
+    await send_power_command(update, context, controller, command, "🟢 Sending command...", deadline)
+
+@callback_route("turn_off", per_device=True)
+async def turn_off_callback(update, context, callback, deadline):
+    """OFF button"""
+    runtime = context.bot_data["runtime"]
+    # Send ON command when buttons are flipped, OFF normally
+    command = "ON" if runtime.buttons_flipped else "OFF"
+    controller = runtime.registry.controller(callback.device)
+    await send_power_command(update, context, controller, command, "🔴 Sending command...", deadline)
+
+@callback_route("flip_state")
+async def flip_state_callback(update, context, callback, deadline):
+    """Flip AC State button"""
+    runtime = context.bot_data["runtime"]
     query = update.callback_query
     await query.answer()
+    success = await flip_switcher_state(runtime)
     
-    data = query.data
+    if success:
+        buttons_flipped = runtime.buttons_flipped
+        flip_status = "ON" if buttons_flipped else "OFF"
+        message = f"✅ Button logic flipped!\n\n🟢 ON button now sends: {flip_status}\n🔴 OFF button now sends: {'OFF' if buttons_flipped else 'ON'}"
+    else:
+        message = "❌ Failed to flip button logic"
     
-    if data == "turn_on":
-        await query.edit_message_text("🟢 Sending command...")
-        
-        # Check if buttons are flipped
-        if buttons_flipped:
-            # Send OFF command when buttons are flipped
-            success = await ac.turn_off_ac()
-            command_sent = "OFF"
-        else:
-            # Send ON command normally
-            success = await ac.turn_on_ac()
-            command_sent = "ON"
-        
-        if success:
-            message = f"✅ {command_sent} command sent!"
-        else:
-            message = f"❌ Failed to send {command_sent} command"
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=get_control_menu()
-        )
+    await edit_message(runtime, query, message, reply_markup=runtime.control_menu)
+
+async def run_fan_out(runtime, update, title, commands):
+    """Command several ACs at once, editing one status message as each AC finishes"""
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+    registry = runtime.registry
+    # Guests only command the ACs they may use
+    targets = [
+        (registry.controller(name), command) for name, command in commands.items()
+        if registry.get(name) and runtime.acl.allows(chat_id, "turn_on" if command == "ON" else "turn_off", name)
+    ]
+    if not targets:
+        await query.answer("❌ No ACs you can control")
+        return
     
-    elif data == "turn_off":
-        await query.edit_message_text("🔴 Sending command...")
-        
-        # Check if buttons are flipped
-        if buttons_flipped:
-            # Send ON command when buttons are flipped
-            success = await ac.turn_on_ac()
-            command_sent = "ON"
-        else:
-            # Send OFF command normally
-            success = await ac.turn_off_ac()
-            command_sent = "OFF"
-        
-        if success:
-            message = f"✅ {command_sent} command sent!"
-        else:
-            message = f"❌ Failed to send {command_sent} command"
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=get_control_menu()
-        )
+    await query.answer(f"{title}...")
+    lines = {controller.device.name: f"⏳ {controller.device.name}: sending {command}" for controller, command in targets}
+    await edit_message(runtime, query, "\n".join([title, ""] + list(lines.values())))
     
-    elif data == "flip_state":
-        success = await ac.flip_switcher_state()
-        
-        if success:
-            flip_status = "ON" if buttons_flipped else "OFF"
-            message = f"✅ Button logic flipped!\n\n🟢 ON button now sends: {flip_status}\n🔴 OFF button now sends: {'OFF' if buttons_flipped else 'ON'}"
-        else:
-            message = "❌ Failed to flip button logic"
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=get_control_menu()
-        )
+    # Flipped buttons mean the device state can't be trusted - always send
+    remaining = len(targets)
+    # aclosing cancels the ACs still pending if an edit below raises
+    async with aclosing(fan_out_commands(runtime.config, targets, force=runtime.buttons_flipped)) as results:
+        async for name, result in results:
+            lines[name] = format_command_result(runtime, result, name)
+            remaining -= 1
+            # The menu comes back with the last result
+            reply_markup = runtime.control_menu if remaining == 0 else None
+            await edit_message(runtime, query, "\n".join([title, ""] + list(lines.values())), reply_markup=reply_markup)
+
+@callback_route("all_off")
+async def all_off_callback(update, context, callback, deadline):
+    """All OFF button"""
+    runtime = context.bot_data["runtime"]
+    # Send ON commands when buttons are flipped, OFF normally
+    command = "ON" if runtime.buttons_flipped else "OFF"
+    await run_fan_out(runtime, update, "⛔ All OFF", {name: command for name in runtime.registry.names})
+
+@callback_route("scene")
+async def scene_callback(update, context, callback, deadline):
+    """Scene button - set every AC in the scene at once"""
+    runtime = context.bot_data["runtime"]
+    scene = callback.params[0] if callback.params else ""
+    commands = runtime.registry.scenes.get(scene)
+    if not commands:
+        await update.callback_query.answer("❓ Unknown scene")
+        return
+    if runtime.buttons_flipped:
+        commands = {name: "ON" if command == "OFF" else "OFF" for name, command in commands.items()}
+    await run_fan_out(runtime, update, f"🎬 {scene}", commands)
 
-async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def handle_callback_query(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
+    """Handle inline keyboard callbacks"""
+    runtime = context.bot_data["runtime"]
+    deadline = Deadline(runtime.config.update_deadline)
+    query = update.callback_query
+    callback = decode_callback_data(query.data)
+    route = CALLBACK_ROUTES.get(callback.action)
+    if route is None:
+        logger.warning(f"Unknown callback data: {query.data}")
+        await query.answer("❓ Unknown button")
+        return
+    
+    handler, per_device = route
+    if per_device:
+        # Resolve the AC up front so per-user device limits also apply to the default AC
+        device = runtime.registry.get(callback.device)
+        if device is None:
+            await query.answer("❓ Unknown AC")
+            return
+        callback = callback._replace(device=device.name)
+    
+    if not check_authorization(runtime, update, callback.action, callback.device):
+        await query.answer("❌ Unauthorized access")
+        return
+    
+    await handler(update, context, callback, deadline)
+
+async def handle_text_message(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
     """Handle text messages by showing menu"""
-    if not check_authorization(update):
+    runtime = context.bot_data["runtime"]
+    if not check_authorization(runtime, update):
         await update.message.reply_text("❌ Unauthorized access")
         return
     
@@ -335,15 +1938,16 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     message = "🤖 Use the buttons below to control your AC:"
     await update.message.reply_text(
         message,
-        reply_markup=get_control_menu()
+        reply_markup=runtime.control_menu
     )
 
-async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def error_handler(update: "Update", context: "ContextTypes.DEFAULT_TYPE"):
     """Handle errors"""
     logger.error(f"Update {update} caused error {context.error}")
 
 async def send_startup_notification(application):
     """Send startup notification to authorized users"""
+    runtime = application.bot_data["runtime"]
     info = get_system_info()
     
     startup_message = f"""🚀 **AC Bot Started!**
@@ -353,28 +1957,206 @@ async def send_startup_notification(application):
 
 Bot is ready to control your AC! 🌡️"""
     
-    for chat_id in AUTHORIZED_CHAT_IDS:
+    for chat_id in sorted(runtime.acl.chat_ids):
         try:
             await application.bot.send_message(
                 chat_id=chat_id,
                 text=startup_message,
                 parse_mode='Markdown',
-                reply_markup=get_control_menu()
+                reply_markup=runtime.control_menu
             )
             logger.info(f"Startup notification sent to {chat_id}")
         except Exception as e:
             logger.error(f"Failed to send startup notification to {chat_id}: {e}")
 
+async def start_state_listener(runtime):
+    """Listen for Switcher UDP broadcasts and keep the state cache up to date"""
+    from aioswitcher.bridge import SwitcherBridge
+    try:
+        runtime.state_bridge = SwitcherBridge(runtime.state_cache.update_from_device)
+        await runtime.state_bridge.start()
+        logger.info("Listening for Switcher state broadcasts")
+    except OSError as e:
+        # Cloud hosts have no LAN broadcasts and ports may be taken - run without the cache
+        logger.warning(f"Could not start Switcher state listener: {e}")
+        await runtime.state_bridge.stop()
+        runtime.state_bridge = None
+
+def file_mtime(path):
+    """Modification time of a file, or None if it can't be read"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+async def watch_config_files(runtime):
+    """Reload ACL_FILE and DEVICES_FILE whenever they change on disk"""
+    config = runtime.config
+    reloads = ((config.acl_file, runtime.reload_access_control), (config.devices_file, runtime.reload_devices))
+    watched = {path: reload for path, reload in reloads if path}
+    mtimes = {path: file_mtime(path) for path in watched}
+    while True:
+        await asyncio.sleep(config.config_poll_interval)
+        for path, reload in watched.items():
+            mtime = file_mtime(path)
+            if mtime != mtimes[path]:
+                mtimes[path] = mtime
+                reload()
+
+def start_config_reloading(runtime):
+    """Reload configuration on SIGHUP and on config file changes"""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, runtime.reload_config)
+    except (AttributeError, NotImplementedError):
+        logger.info("SIGHUP not available - config reloads only on file changes")
+    if runtime.config.acl_file or runtime.config.devices_file:
+        runtime.config_watcher = asyncio.create_task(watch_config_files(runtime))
+
 async def post_init(application):
     """Called after the bot starts - send startup notification"""
-    await send_startup_notification(application)
+    runtime = application.bot_data["runtime"]
+    start_config_reloading(runtime)
+    runtime.prewarm()
+    with startup_timer.phase("remotes"):
+        await runtime.preload_remotes()
+    if runtime.config.enable_state_listener:
+        with startup_timer.phase("state listener"):
+            await start_state_listener(runtime)
+    with startup_timer.phase("startup notification"):
+        await send_startup_notification(application)
+    report_startup(runtime.config)
+    if runtime.config.memory_report_interval > 0:
+        runtime.memory_reporter = asyncio.create_task(report_memory(runtime.config))
 
-def main():
-    """Start the bot"""
-    logger.info("=== STARTING SIMPLIFIED TELEGRAM AC TOGGLE BOT ===")
+def report_startup(config):
+    """Log how long startup took and where the time went, warning past STARTUP_BUDGET"""
+    elapsed = startup_timer.elapsed()
+    logger.info(f"Ready {elapsed:.2f}s after import started: {startup_timer.report()}")
+    if elapsed > config.startup_budget:
+        logger.warning(f"Startup took {elapsed:.2f}s, over the {config.startup_budget:.1f}s budget (STARTUP_BUDGET)")
+    check_memory(config, "after startup")
+
+def check_memory(config, when):
+    """Log the RSS, warning past MEMORY_BUDGET"""
+    rss, _ = memory_usage()
+    logger.info(f"Memory {when}: {describe_memory()}, {config.profile} profile")
+    if rss is not None and 0 < config.memory_budget < rss:
+        logger.warning(f"RSS {rss:.1f}MB is over the {config.memory_budget:.0f}MB budget (MEMORY_BUDGET)")
+
+async def report_memory(config):
+    """Log the steady state RSS every MEMORY_REPORT_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(config.memory_report_interval)
+        check_memory(config, "at steady state")
+
+async def post_shutdown(application):
+    """Called when the bot stops - close pooled device connections"""
+    runtime = application.bot_data["runtime"]
+    if runtime.config_watcher:
+        runtime.config_watcher.cancel()
+    if runtime.memory_reporter:
+        runtime.memory_reporter.cancel()
+    if runtime.state_bridge:
+        await runtime.state_bridge.stop()
+    await runtime.pool.close()
+
+# First "chat":{"id":...} in a raw update - the chat of the message or of the tapped button's message
+CHAT_ID_PATTERN = re.compile(rb'"chat"\s*:\s*\{\s*"id"\s*:\s*(-?\d+)')
+
+def extract_chat_id(body):
+    """Chat ID of a raw JSON update, found without parsing the JSON (None if absent)"""
+    match = CHAT_ID_PATTERN.search(body)
+    return int(match.group(1)) if match else None
+
+def build_webhook_app(application):
+    """Tornado app serving the webhook, with updates from foreign chats dropped before python-telegram-bot sees them"""
+    import tornado.web
+    from telegram import Update
+    
+    class PrefilterWebhookHandler(tornado.web.RequestHandler):
+        """Webhook endpoint that drops foreign updates before python-telegram-bot sees them"""
+        SUPPORTED_METHODS = ("POST",)
+        
+        def initialize(self, bot_application):
+            self.bot_application = bot_application
+            self.runtime = bot_application.bot_data["runtime"]
+        
+        async def post(self):
+            """Check the secret token and chat ID, then queue the update"""
+            token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token, self.runtime.config.webhook_secret):
+                raise tornado.web.HTTPError(403)
+            
+            body = self.request.body
+            chat_id = extract_chat_id(body)
+            if chat_id is None or chat_id not in self.runtime.acl.chat_ids:
+                # Answer 200 so Telegram doesn't retry, but never build an Update for it
+                logger.debug(f"Dropped webhook update from chat {chat_id}")
+                return
+            
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise tornado.web.HTTPError(400, "body isn't JSON")
+            if not isinstance(data, dict):
+                raise tornado.web.HTTPError(400, "body isn't a JSON object")
+            update = Update.de_json(data, self.bot_application.bot)
+            await self.bot_application.update_queue.put(update)
+        
+        def log_exception(self, typ, value, tb):
+            """Log rejected requests quietly, and every other failure (a 500) with its traceback"""
+            if isinstance(value, tornado.web.HTTPError):
+                logger.debug(f"Webhook request rejected: {value}")
+            else:
+                logger.error(f"Webhook update failed: {typ.__name__}: {value}", exc_info=(typ, value, tb))
+    
+    return tornado.web.Application(
+        [(r"/webhook/?", PrefilterWebhookHandler, {"bot_application": application})],
+        log_function=lambda handler: None
+    )
+
+async def run_webhook_server(application, port, webhook_url):
+    """Serve the webhook with the pre-dispatch filter in front of python-telegram-bot"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    with startup_timer.phase("import tornado"):
+        web_app = build_webhook_app(application)
+    
+    async with application:
+        await application.post_init(application)
+        webhook_secret = application.bot_data["runtime"].config.webhook_secret
+        await application.bot.set_webhook(webhook_url, secret_token=webhook_secret)
+        await application.start()
+        server = web_app.listen(port, address="0.0.0.0")
+        logger.info(f"Webhook server listening on port {port}")
+        
+        await stop_event.wait()
+        
+        server.stop()
+        await application.stop()
+    await application.post_shutdown(application)
+
+def build_application(config):
+    """Create the bot application for a BotConfig, with all handlers registered.
+    
+    Reads ACL_FILE and DEVICES_FILE - raises OSError, KeyError, TypeError
+    or ValueError when they are unreadable or invalid.
+    """
+    with startup_timer.phase("import telegram.ext"):
+        from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
     
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    with startup_timer.phase("application"):
+        application = (
+            Application.builder().token(config.bot_token)
+            .base_url(f"{config.bot_api_url}/bot").base_file_url(f"{config.bot_api_url}/file/bot")
+            .connection_pool_size(config.bot_api_connections)
+            .job_queue(None)  # no scheduled jobs - don't start APScheduler when it happens to be installed
+            .post_init(post_init).post_shutdown(post_shutdown).build()
+        )
+        application.bot_data["runtime"] = BotRuntime(config)
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
@@ -382,13 +2164,32 @@ def main():
     application.add_handler(CallbackQueryHandler(handle_callback_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
     application.add_error_handler(error_handler)
+    return application
 
+def main():
+    """Start the bot"""
+    setup_logging()
+    try:
+        with startup_timer.phase("config"):
+            config = load_config()
+    except ConfigError as e:
+        logger.error(f"Configuration error: {e}")
+        logger.error("Please check your .env file or environment variables")
+        exit(1)
+    
+    logger.info("=== STARTING SIMPLIFIED TELEGRAM AC TOGGLE BOT ===")
+    
+    try:
+        application = build_application(config)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        logger.error(f"Error reading ACL or device configuration: {e}")
+        exit(1)
+    
     # Start bot
     logger.info("Bot is running with simple toggle interface!")
     
-    port = int(os.environ.get("PORT", 0))
-    if port:
-        render_url = os.environ.get('RENDER_EXTERNAL_URL') or os.environ.get('RENDER_SERVICE_URL')
+    if config.port:
+        render_url = config.public_url
         if not render_url:
             logger.error("ERROR: RENDER_EXTERNAL_URL environment variable not set!")
             return
@@ -396,15 +2197,13 @@ def main():
         webhook_url = f"https://{render_url}/webhook" if not render_url.startswith('https://') else f"{render_url}/webhook"
         logger.info(f"Starting webhook mode: {webhook_url}")
         
-        application.run_webhook(
-            listen="0.0.0.0",
-            port=port,
-            url_path="webhook",
-            webhook_url=webhook_url
-        )
+        asyncio.run(run_webhook_server(application, config.port, webhook_url))
     else:
         logger.info("Starting polling mode for local testing")
         application.run_polling()
 
+# Everything above ran while the module was imported
+startup_timer.record("import", time.perf_counter() - IMPORT_STARTED)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file